@@ -0,0 +1,102 @@
+# Enviro — Binary reading archive
+# Fixed-width daily archive, an alternative to readings/*.csv.
+# ============================================================
+#
+# readings/YYYY-MM-DD.bin starts with a one-line JSON header listing the
+# columns (see records.py). Every row is the reading's epoch timestamp
+# followed by its packed values, so row i sits at header_len + i * row_size
+# and a timestamp is found by binary search rather than parsing text.
+# tools/read_archive.py decodes these files on a host (into NumPy arrays).
+
+import os
+import struct
+from ucollections import OrderedDict
+import records
+
+VERSION = 1
+
+def _row_format(header):
+  return "<i" + "".join(c[1] for c in header["columns"])
+
+def _pack(header, fmt, epoch, readings):
+  values = [epoch]
+  for name, code in header["columns"]:
+    values.append(records.pack_value(code, readings.get(name)))
+  return struct.pack(fmt, *values)
+
+def _unpack(header, fmt, data):
+  values = struct.unpack(fmt, data)
+  readings = OrderedDict()
+  for i, (name, code) in enumerate(header["columns"]):
+    readings[name] = records.unpack_value(code, values[i + 1])
+  return values[0], readings
+
+def _layout(path):
+  header, header_len = records.read_header(path)
+  fmt = _row_format(header)
+  return header, fmt, header_len, struct.calcsize(fmt)
+
+def _migrate(path, layout, columns):
+  """Rewrite path with widened columns (new keys are missing in older rows)."""
+  old_header, old_fmt, header_len, row_size = layout
+  header = {"version": VERSION, "columns": columns}
+  fmt = _row_format(header)
+  tmp = path + ".tmp"
+  with open(path, "rb") as src:
+    with open(tmp, "wb") as dst:
+      dst.write(records.header_bytes(header))
+      src.seek(header_len)
+      while True:
+        data = src.read(row_size)
+        if len(data) < row_size:
+          break
+        epoch, readings = _unpack(old_header, old_fmt, data)
+        dst.write(_pack(header, fmt, epoch, readings))
+  os.rename(tmp, path)
+  return header
+
+def append(path, epoch, readings):
+  """Append one reading to the archive file at path, creating it if needed."""
+  try:
+    layout = _layout(path)
+  except OSError:
+    layout = None
+
+  if layout is None:
+    header = {"version": VERSION, "columns": records.merge_columns([], readings)[0]}
+    with open(path, "wb") as f:
+      f.write(records.header_bytes(header))
+  else:
+    header = layout[0]
+    columns, changed = records.merge_columns(header["columns"], readings)
+    if changed:
+      header = _migrate(path, layout, columns)
+
+  with open(path, "ab") as f:
+    f.write(_pack(header, _row_format(header), epoch, readings))
+
+def row_count(path):
+  _, _, header_len, row_size = _layout(path)
+  return (os.stat(path)[6] - header_len) // row_size
+
+def read_row(path, index):
+  """Returns (epoch, readings) for row index — a single seek and read."""
+  header, fmt, header_len, row_size = _layout(path)
+  with open(path, "rb") as f:
+    f.seek(header_len + index * row_size)
+    return _unpack(header, fmt, f.read(row_size))
+
+def find(path, epoch):
+  """Index of the first row at or after epoch (row_count() if there is none)."""
+  _, _, header_len, row_size = _layout(path)
+  lo = 0
+  hi = (os.stat(path)[6] - header_len) // row_size
+  with open(path, "rb") as f:
+    while lo < hi:
+      mid = (lo + hi) // 2
+      f.seek(header_len + mid * row_size)
+      if struct.unpack("<i", f.read(4))[0] < epoch:
+        lo = mid + 1
+      else:
+        hi = mid
+  return lo
@@ -5,36 +5,12 @@
 import math
 from ucollections import OrderedDict
 import config
+import helpers
+import compensation
 
 bme688 = None
 bh1745 = None
 
-# humidity conversion helpers (for USB temperature compensation)
-WATER_VAPOR_SPECIFIC_GAS_CONSTANT = 461.5
-CRITICAL_WATER_TEMPERATURE = 647.096
-CRITICAL_WATER_PRESSURE = 22064000
-
-def _celcius_to_kelvin(t):
-  return t + 273.15
-
-def _saturation_vapor_pressure(temp_k):
-  v = 1 - (temp_k / CRITICAL_WATER_TEMPERATURE)
-  a1, a2, a3, a4, a5, a6 = -7.85951783, 1.84408259, -11.7866497, 22.6807411, -15.9618719, 1.80122502
-  return CRITICAL_WATER_PRESSURE * math.exp(
-    CRITICAL_WATER_TEMPERATURE / temp_k *
-    (a1*v + a2*v**1.5 + a3*v**3 + a4*v**3.5 + a5*v**4 + a6*v**7.5)
-  )
-
-def _relative_to_absolute_humidity(rh, temp_c):
-  temp_k = _celcius_to_kelvin(temp_c)
-  actual_vp = _saturation_vapor_pressure(temp_k) * (rh / 100)
-  return actual_vp / (WATER_VAPOR_SPECIFIC_GAS_CONSTANT * temp_k)
-
-def _absolute_to_relative_humidity(ah, temp_c):
-  temp_k = _celcius_to_kelvin(temp_c)
-  svp = _saturation_vapor_pressure(temp_k)
-  return (WATER_VAPOR_SPECIFIC_GAS_CONSTANT * temp_k * ah) / svp * 100
-
 def lux_from_rgbc(r, g, b, c):
   if g < 1:
     tmp = 0
@@ -73,23 +49,20 @@ def init_sensors(i2c):
   i2c.writeto_mem(0x38, 0x44, b'\x02')  # undocumented BH1745 default fix
 
 def read_sensors(vbus_present):
-  data = bme688.read()
-
-  temperature = round(data[0], 2)
-  humidity = round(data[2], 2)
+  # start the BH1745's 160ms integration first so it runs while the BME688
+  # (which blocks for its gas heater cycle) is read.
+  bh1745.measurement_time_ms(160)
+  light_ready = helpers.deadline(160)
 
-  # compensate for USB power heating
-  if vbus_present:
-    adjusted_temp = temperature - config.usb_power_temperature_offset
-    abs_humidity = _relative_to_absolute_humidity(humidity, temperature)
-    humidity = _absolute_to_relative_humidity(abs_humidity, adjusted_temp)
-    temperature = adjusted_temp
+  data = bme688.read()
 
-  pressure = round(data[1] / 100.0, 2)
+  # calibration profile (incl. compensation for USB power heating)
+  temperature, humidity, pressure = compensation.compensate(
+    data[0], data[2], data[1] / 100.0, vbus_present)
   gas_resistance = round(data[3])
   aqi = round(math.log(gas_resistance) + 0.04 * humidity, 1)
 
-  bh1745.measurement_time_ms(160)
+  helpers.wait_until(light_ready)
   r, g, b, c = bh1745.rgbc_raw()
 
   return OrderedDict({
@@ -5,11 +5,15 @@
 
 import math
 import time
+import micropython
+from array import array
 from machine import Pin, ADC
 from time import sleep
 from ucollections import OrderedDict
 import config
 import logging
+import helpers
+import compensation
 
 SENSOR_RESET_PIN = 9
 SENSOR_ENABLE_PIN = 10
@@ -18,6 +22,9 @@ PMS_I2C_SDA_PIN = 14
 PMS_I2C_SCL_PIN = 15
 NOISE_ADC_PIN = 0
 MIC_SAMPLE_TIME_MS = 3000
+MIC_BLOCK_SAMPLES = 1024  # samples captured per block before reducing
+MIC_COLLECT_MARGIN_MS = 1000  # extra wait for the core 1 window before giving up
+ADC_VOLTS_PER_COUNT = 3.3 / 65535
 
 # PMS5003I data frame field indices
 PM1_UGM3 = 2
@@ -29,71 +36,174 @@ sensor_reset_pin = None
 sensor_enable_pin = None
 boost_enable_pin = None
 noise_adc = None
+_mic_buffer = None
 
-# humidity conversion helpers (for USB temperature compensation)
-WATER_VAPOR_SPECIFIC_GAS_CONSTANT = 461.5
-CRITICAL_WATER_TEMPERATURE = 647.096
-CRITICAL_WATER_PRESSURE = 22064000
-
-def _celcius_to_kelvin(t):
-  return t + 273.15
-
-def _saturation_vapor_pressure(temp_k):
-  v = 1 - (temp_k / CRITICAL_WATER_TEMPERATURE)
-  a1, a2, a3, a4, a5, a6 = -7.85951783, 1.84408259, -11.7866497, 22.6807411, -15.9618719, 1.80122502
-  return CRITICAL_WATER_PRESSURE * math.exp(
-    CRITICAL_WATER_TEMPERATURE / temp_k *
-    (a1*v + a2*v**1.5 + a3*v**3 + a4*v**3.5 + a5*v**4 + a6*v**7.5)
-  )
-
-def _relative_to_absolute_humidity(rh, temp_c):
-  temp_k = _celcius_to_kelvin(temp_c)
-  actual_vp = _saturation_vapor_pressure(temp_k) * (rh / 100)
-  return actual_vp / (WATER_VAPOR_SPECIFIC_GAS_CONSTANT * temp_k)
-
-def _absolute_to_relative_humidity(ah, temp_c):
-  temp_k = _celcius_to_kelvin(temp_c)
-  svp = _saturation_vapor_pressure(temp_k)
-  return (WATER_VAPOR_SPECIFIC_GAS_CONSTANT * temp_k * ah) / svp * 100
+# core 1 microphone sampling (config.dual_core_sampling): the thread writes
+# into a preallocated result buffer under the lock, core 0 polls the state
+NOISE_IDLE, NOISE_RUNNING, NOISE_DONE, NOISE_FAILED = 0, 1, 2, 3
+_noise_lock = None
+_noise_result = array("f", (0, 0, 0))  # vpp, vrms, db
+_noise_state = NOISE_IDLE
 
 def particulates(data, measure):
   """Decode a 16-bit big-endian value from the PMS5003I data frame."""
   return (data[measure * 2] << 8) | data[measure * 2 + 1]
 
+@micropython.native
+def _fill_block(read, buf, n):
+  for i in range(n):
+    buf[i] = read()
+
+@micropython.native
+def _reduce_block(buf, n):
+  """Returns (min, max, sum of squared deviations from the block mean / 256)."""
+  lo = 65535
+  hi = 0
+  total = 0
+  for i in range(n):
+    v = buf[i]
+    if v < lo:
+      lo = v
+    if v > hi:
+      hi = v
+    total += v
+  mean = total // n
+
+  # deviations are scaled down by 16 (rounded to nearest, so -1..-7 and
+  # +1..+7 both become 0) and flushed into a float every 128 samples so the
+  # running sum stays a small int
+  squares = 0.0
+  part = 0
+  for i in range(n):
+    d = (buf[i] - mean + 8) >> 4
+    part += d * d
+    if i & 127 == 127:
+      squares += part
+      part = 0
+  return lo, hi, squares + part
+
+def _sample_noise(sample_time_ms):
+  """Returns (vpp, vrms, db, samples, elapsed_ms). No logging, so it can run
+  on core 1."""
+  n = MIC_BLOCK_SAMPLES
+  read = noise_adc.read_u16
+  lo = 65535
+  hi = 0
+  squares = 0.0
+  samples = 0
+
+  start = time.ticks_ms()
+  while time.ticks_diff(time.ticks_ms(), start) < sample_time_ms:
+    _fill_block(read, _mic_buffer, n)
+    block_lo, block_hi, block_squares = _reduce_block(_mic_buffer, n)
+    lo = min(lo, block_lo)
+    hi = max(hi, block_hi)
+    squares += block_squares
+    samples += n
+  elapsed_ms = time.ticks_diff(time.ticks_ms(), start)
+
+  vpp = (hi - lo) * ADC_VOLTS_PER_COUNT if samples else 0
+  vrms = math.sqrt(squares / samples) * 16 * ADC_VOLTS_PER_COUNT if samples else 0
+  db = 20 * math.log10(vrms) + config.noise_db_offset if vrms > 0 else 0
+  return vpp, vrms, db, samples, elapsed_ms
+
+def measure_noise(sample_time_ms=MIC_SAMPLE_TIME_MS):
+  """Sample the microphone in blocks. Returns (peak-to-peak V, RMS V, approx dB)."""
+  vpp, vrms, db, samples, elapsed_ms = _sample_noise(sample_time_ms)
+  logging.debug(f"  - {samples} mic samples in {elapsed_ms}ms")
+  return vpp, vrms, db
+
+def _noise_thread():
+  global _noise_state
+  state = NOISE_FAILED
+  try:
+    vpp, vrms, db, _, _ = _sample_noise(MIC_SAMPLE_TIME_MS)
+    state = NOISE_DONE
+  finally:
+    # always leave NOISE_RUNNING, or core 0 would wait for a result forever
+    with _noise_lock:
+      if state == NOISE_DONE:
+        _noise_result[0] = vpp
+        _noise_result[1] = vrms
+        _noise_result[2] = db
+      _noise_state = state
+
+def start_sampling():
+  """With config.dual_core_sampling, start the microphone window on core 1
+  so core 0 can sync the clock, bring up WiFi or write flash meanwhile.
+  read_sensors() collects the result."""
+  global _noise_lock, _noise_state
+  if not config.dual_core_sampling or _noise_state == NOISE_RUNNING:
+    return
+  try:
+    import _thread
+  except ImportError:
+    return
+  if _noise_lock is None:
+    _noise_lock = _thread.allocate_lock()
+  _noise_state = NOISE_RUNNING
+  _thread.start_new_thread(_noise_thread, ())
+  logging.debug("  - sampling microphone on core 1")
+
+def _collect_noise():
+  """Wait for the core 1 window to finish. Returns (vpp, vrms, db), or None
+  if sampling failed or didn't finish in time."""
+  global _noise_state
+  give_up = helpers.deadline(MIC_SAMPLE_TIME_MS + MIC_COLLECT_MARGIN_MS)
+  while time.ticks_diff(give_up, time.ticks_ms()) > 0:
+    with _noise_lock:
+      if _noise_state == NOISE_DONE:
+        _noise_state = NOISE_IDLE
+        return _noise_result[0], _noise_result[1], _noise_result[2]
+      if _noise_state == NOISE_FAILED:
+        _noise_state = NOISE_IDLE
+        return None
+    time.sleep_ms(10)
+  return None
+
 def init_sensors(i2c):
-  global bme280, sensor_reset_pin, sensor_enable_pin, boost_enable_pin, noise_adc
+  global bme280, sensor_reset_pin, sensor_enable_pin, boost_enable_pin, noise_adc, _mic_buffer
   from breakout_bme280 import BreakoutBME280
   bme280 = BreakoutBME280(i2c, 0x77)
   sensor_reset_pin = Pin(SENSOR_RESET_PIN, Pin.OUT, value=True)
   sensor_enable_pin = Pin(SENSOR_ENABLE_PIN, Pin.OUT, value=False)
   boost_enable_pin = Pin(BOOST_ENABLE_PIN, Pin.OUT, value=False)
   noise_adc = ADC(NOISE_ADC_PIN)
+  _mic_buffer = array("H", bytes(2 * MIC_BLOCK_SAMPLES))
 
 def read_sensors(vbus_present):
+  # sensors are read in an overlapped order: the PMS5003I fan starts first,
+  # and the BME280 and microphone are read during its 5s warm-up.
+
+  # ---- particulate matter sensor (PMS5003I) warm-up ----
+  logging.debug("  - powering up PMS5003")
+  boost_enable_pin.value(True)
+  sensor_enable_pin.value(True)
+  pms_ready = helpers.deadline(5000)  # allow airflow to stabilise
+
   # BME280 returns stale register contents on first read; do a dummy read,
   # wait briefly, then read again for a fresh result.
   bme280.read()
   sleep(0.1)
   bme280_data = bme280.read()
 
-  temperature = round(bme280_data[0], 2)
-  humidity = round(bme280_data[2], 2)
-
-  # compensate for USB power heating
-  if vbus_present:
-    adjusted_temp = temperature - config.usb_power_temperature_offset
-    abs_humidity = _relative_to_absolute_humidity(humidity, temperature)
-    humidity = _absolute_to_relative_humidity(abs_humidity, adjusted_temp)
-    temperature = adjusted_temp
-
-  pressure = round(bme280_data[1] / 100.0, 2)
-
-  # ---- particulate matter sensor (PMS5003I) ----
-  logging.debug("  - powering up PMS5003")
-  boost_enable_pin.value(True)
-  sensor_enable_pin.value(True)
-  sleep(5)  # allow airflow to stabilise
-
+  # calibration profile (incl. compensation for USB power heating)
+  temperature, humidity, pressure = compensation.compensate(
+    bme280_data[0], bme280_data[2], bme280_data[1] / 100.0, vbus_present)
+
+  # ---- microphone (noise level) ----
+  noise = None
+  if _noise_state != NOISE_IDLE:
+    noise = _collect_noise()
+    if noise is None:
+      logging.error("  - core 1 microphone sampling failed or timed out")
+  if noise is None:
+    logging.debug("  - sampling microphone")
+    noise = measure_noise()
+  noise_vpp, noise_rms, noise_db = noise
+
+  # ---- particulate matter sensor (PMS5003I) read ----
+  helpers.wait_until(pms_ready)
   logging.debug("  - reading PMS5003I via I2C")
   from pimoroni_i2c import PimoroniI2C
   pms_i2c = PimoroniI2C(PMS_I2C_SDA_PIN, PMS_I2C_SCL_PIN, 100000)
@@ -102,22 +212,13 @@ def read_sensors(vbus_present):
   sensor_enable_pin.value(False)
   boost_enable_pin.value(False)
 
-  # ---- microphone (noise level as peak-to-peak voltage) ----
-  logging.debug("  - sampling microphone")
-  start = time.ticks_ms()
-  min_value = 1.65
-  max_value = 1.65
-  while time.ticks_diff(time.ticks_ms(), start) < MIC_SAMPLE_TIME_MS:
-    value = (noise_adc.read_u16() * 3.3) / 65535
-    min_value = min(min_value, value)
-    max_value = max(max_value, value)
-  noise_vpp = max_value - min_value
-
   return OrderedDict({
     "temperature": temperature,
     "humidity": humidity,
     "pressure": pressure,
     "noise": round(noise_vpp, 3),
+    "noise_rms": round(noise_rms, 4),
+    "noise_db": round(noise_db, 1),
     "pm1": particulates(particulate_data, PM1_UGM3),
     "pm2_5": particulates(particulate_data, PM2_5_UGM3),
     "pm10": particulates(particulate_data, PM10_UGM3),
@@ -6,6 +6,7 @@
 import math
 import time
 import os
+import struct
 from machine import Pin
 from time import sleep
 from ucollections import OrderedDict
@@ -18,8 +19,11 @@ RAIN_PIN = 10
 WIND_DIRECTION_PIN = 26
 
 RAIN_MM_PER_TICK = 0.2794
+RAIN_LOG = "rain.bin"
+RAIN_LOG_MAX_TIPS = 1000  # ~4 KB; far more than a reading interval can see
 WIND_CM_RADIUS = 7.0
 WIND_FACTOR = 0.0218
+WIND_DEBOUNCE_US = 1000  # ignore reed switch bounce shorter than this
 
 bme280 = None
 ltr559 = None
@@ -29,6 +33,13 @@ wind_speed_pin = None
 rain_pin = None
 _last_rain_state = False
 
+# anemometer edge state, updated from the pin IRQ (hard IRQ: no allocation)
+_edge_count = 0
+_edge_first = 0
+_edge_last = 0
+_edge_prev = 0
+_edge_min_rotation_us = 0
+
 def init_sensors(i2c):
   global bme280, ltr559, _LTR559_LUX, wind_direction_pin, wind_speed_pin, rain_pin
   from breakout_bme280 import BreakoutBME280
@@ -40,29 +51,50 @@ def init_sensors(i2c):
   wind_direction_pin = Analog(WIND_DIRECTION_PIN)
   wind_speed_pin = Pin(WIND_SPEED_PIN, Pin.IN, Pin.PULL_UP)
   rain_pin = Pin(RAIN_PIN, Pin.IN, Pin.PULL_DOWN)
+  if helpers.file_exists("rain.txt"):
+    os.remove("rain.txt")  # text tip log from earlier firmware
+
+def _wind_edge(pin):
+  global _edge_count, _edge_first, _edge_last, _edge_prev, _edge_min_rotation_us
+  now = time.ticks_us()
+  if _edge_count > 0:
+    if time.ticks_diff(now, _edge_last) < WIND_DEBOUNCE_US:
+      return
+    # two edges per rotation — the shortest rotation gives the gust speed
+    if _edge_count > 1:
+      rotation_us = time.ticks_diff(now, _edge_prev)
+      if rotation_us < _edge_min_rotation_us:
+        _edge_min_rotation_us = rotation_us
+    _edge_prev = _edge_last
+  else:
+    _edge_first = now
+  _edge_last = now
+  _edge_count += 1
+
+def start_wind_sampling():
+  """Reset the edge counters and start counting anemometer pulses via IRQ."""
+  global _edge_count, _edge_min_rotation_us
+  _edge_count = 0
+  _edge_min_rotation_us = 0x3fffffff
+  wind_speed_pin.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=_wind_edge, hard=True)
+
+def stop_wind_sampling():
+  """Stop counting and return (average, gust) wind speed in m/s."""
+  wind_speed_pin.irq(handler=None)
+  count, first, last, min_rotation_us = _edge_count, _edge_first, _edge_last, _edge_min_rotation_us
+
+  if count < 2:
+    return 0.0, 0.0
 
-def measure_wind_speed(sample_time_ms=1000):
-  """Sample anemometer pulses and return wind speed in m/s."""
-  state = wind_speed_pin.value()
-  ticks = []
-
-  start = time.ticks_ms()
-  while time.ticks_diff(time.ticks_ms(), start) <= sample_time_ms:
-    now = wind_speed_pin.value()
-    if now != state:
-      ticks.append(time.ticks_ms())
-      state = now
-
-  if len(ticks) < 2:
-    return 0
-
-  average_tick_ms = time.ticks_diff(ticks[-1], ticks[0]) / (len(ticks) - 1)
-  if average_tick_ms == 0:
-    return 0
-
-  rotation_hz = (1000 / average_tick_ms) / 2
   circumference = WIND_CM_RADIUS * 2.0 * math.pi
-  return rotation_hz * circumference * WIND_FACTOR
+  average_tick_us = time.ticks_diff(last, first) / (count - 1)
+  rotation_hz = (1000000 / average_tick_us) / 2
+  speed = rotation_hz * circumference * WIND_FACTOR
+
+  gust = speed
+  if count > 2:
+    gust = max(speed, (1000000 / min_rotation_us) * circumference * WIND_FACTOR)
+  return speed, gust
 
 def measure_wind_direction():
   """Read wind vane ADC and return compass heading in degrees (0-315, 45 deg steps)."""
@@ -84,16 +116,40 @@ def measure_wind_direction():
 
   return closest_index * 45
 
+# rain.bin is a packed array of uint32 epochs: the first is the start of the
+# current accumulation window (the previous reading), the rest are tips.
+# Recording a tip is a single 4-byte append; the tip count is the file size.
+
+def _start_rain_window(start):
+  with open(RAIN_LOG, "wb") as f:
+    f.write(struct.pack("<I", start))
+
+def _align_rain_log(size):
+  """Drop a partial entry left by a brownout mid-append, so later tips
+  don't land out of step (the log is at most ~4 KB)."""
+  with open(RAIN_LOG, "rb") as f:
+    data = f.read(size - size % 4)
+  with open(RAIN_LOG + ".tmp", "wb") as f:
+    f.write(data)
+  os.rename(RAIN_LOG + ".tmp", RAIN_LOG)
+
 def _record_rain_tip():
-  rain_entries = []
-  if helpers.file_exists("rain.txt"):
-    with open("rain.txt", "r") as f:
-      rain_entries = f.read().split("\n")
-  rain_entries.append(helpers.datetime_string())
-  # keep at most 190 entries (~4KB, fits in one filesystem block)
-  rain_entries = rain_entries[-190:]
-  with open("rain.txt", "w") as f:
-    f.write("\n".join(rain_entries))
+  now = time.time()
+  try:
+    size = os.stat(RAIN_LOG)[6]
+  except OSError:
+    size = 0
+  if size < 4:
+    # no window yet — assume it started one reading interval ago
+    _start_rain_window(now - config.reading_frequency * 60)
+    size = 4
+  if size // 4 > RAIN_LOG_MAX_TIPS:
+    logging.error("> rain log full, tip not recorded")
+    return
+  if size % 4:
+    _align_rain_log(size)
+  with open(RAIN_LOG, "ab") as f:
+    f.write(struct.pack("<I", now))
 
 def pre_read():
   """Poll the rain pin and record a tip if detected."""
@@ -104,43 +160,56 @@ def pre_read():
     logging.debug("> rain tip recorded")
   _last_rain_state = current
 
-def _rainfall_since(seconds_since_last):
-  """Calculate rainfall (mm) and rain rate (mm/s) from rain.txt entries."""
-  amount = 0
-  now = helpers.timestamp_to_epoch(helpers.datetime_string())
-  if helpers.file_exists("rain.txt"):
-    with open("rain.txt", "r") as f:
-      rain_entries = f.read().split("\n")
-    for entry in rain_entries:
-      if entry:
-        ts = helpers.timestamp_to_epoch(entry)
-        if now - ts < seconds_since_last:
-          amount += RAIN_MM_PER_TICK
-    os.remove("rain.txt")
-
-  per_second = amount / seconds_since_last if seconds_since_last > 0 else 0
-  return amount, per_second
+def _rainfall_since_last_reading():
+  """Returns rainfall (mm) and rain rate (mm/s) since the previous reading,
+  then starts a new accumulation window."""
+  now = time.time()
+  tips = 0
+  seconds = config.reading_frequency * 60
+  try:
+    size = os.stat(RAIN_LOG)[6]
+    with open(RAIN_LOG, "rb") as f:
+      start = struct.unpack("<I", f.read(4))[0]
+    tips = size // 4 - 1
+    if now > start:
+      seconds = now - start
+  except (OSError, ValueError):
+    pass
+  _start_rain_window(now)
+
+  amount = tips * RAIN_MM_PER_TICK
+  return amount, amount / seconds
 
 def read_sensors(vbus_present):
+  # the anemometer is counted by IRQ in the background, so start it first
+  # and read the other sensors inside its averaging window.
+  start_wind_sampling()
+  wind_done = helpers.deadline(config.wind_sample_time * 1000)
+
   # BME280 returns stale register contents on first read; do a dummy
-  # read, wait briefly, then read the fresh measurement.
+  # read, then read the fresh measurement at least 100ms later (the LTR-559
+  # is read in the meantime).
   bme280.read()
-  time.sleep(0.1)
-  bme280_data = bme280.read()
+  bme280_ready = helpers.deadline(100)
 
   ltr_data = ltr559.get_reading()
+  rain, rain_per_second = _rainfall_since_last_reading()
+  wind_direction = measure_wind_direction()
+
+  helpers.wait_until(bme280_ready)
+  bme280_data = bme280.read()
 
-  # use reading_frequency (minutes) as the rain accumulation window
-  seconds_since_last = config.reading_frequency * 60
-  rain, rain_per_second = _rainfall_since(seconds_since_last)
+  helpers.wait_until(wind_done)
+  wind_speed, wind_gust = stop_wind_sampling()
 
   return OrderedDict({
     "temperature": round(bme280_data[0], 2),
     "humidity": round(bme280_data[2], 2),
     "pressure": round(bme280_data[1] / 100.0, 2),
     "luminance": round(ltr_data[_LTR559_LUX], 2),
-    "wind_speed": round(measure_wind_speed(), 2),
+    "wind_speed": round(wind_speed, 2),
+    "wind_gust": round(wind_gust, 2),
     "rain": round(rain, 4),
     "rain_per_second": round(rain_per_second, 4),
-    "wind_direction": measure_wind_direction(),
+    "wind_direction": wind_direction,
   })
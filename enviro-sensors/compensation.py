@@ -0,0 +1,102 @@
+# Enviro — Temperature/humidity compensation
+# Shared psychrometrics and per-device calibration for the BME280/BME688.
+# ============================================================
+#
+# Saturation vapour pressure comes from a table precomputed with the
+# IAPWS formula (saturation_vapor_pressure_exact) at 1 °C steps over the
+# sensors' -40..85 °C range, linearly interpolated, within 0.12% of the exact
+# value (0.04 %RH after a 2.1 °C correction; tools/bench_compensation.py
+# checks this and regenerates the table).
+#
+# compensate() applies config.calibration: a temperature offset per power
+# mode (a constant, or a curve of (sensor °C, offset) points), keeping the
+# absolute humidity constant across that offset, then humidity and pressure
+# trims.
+
+import math
+from array import array
+import config
+
+CRITICAL_WATER_TEMPERATURE = 647.096
+CRITICAL_WATER_PRESSURE = 22064000
+
+SVP_MIN_C = -40
+SVP_STEP_C = 1
+SVP_TABLE = array("f", (  # Pa at SVP_MIN_C + i * SVP_STEP_C
+  19.046, 21.1073, 23.3692, 25.8491, 28.5655, 31.5382, 34.7886, 38.3395,  # -40 °C
+  42.2155, 46.4425, 51.0487, 56.0637, 61.5196, 67.4501, 73.8915, 80.8823,  # -32 °C
+  88.4635, 96.6785, 105.574, 115.198, 125.604, 136.846, 148.984, 162.078,  # -24 °C
+  176.195, 191.404, 207.778, 225.394, 244.333, 264.683, 286.533, 309.979,  # -16 °C
+  335.121, 362.066, 390.923, 421.811, 454.852, 490.174, 527.912, 568.209,  # -8 °C
+  611.213, 657.078, 705.969, 758.054, 813.513, 872.53, 935.301, 1002.03,  # 0 °C
+  1072.92, 1148.21, 1228.11, 1312.88, 1402.75, 1497.99, 1598.87, 1705.68,  # 8 °C
+  1818.7, 1938.24, 2064.61, 2198.15, 2339.19, 2488.1, 2645.22, 2810.96,  # 16 °C
+  2985.69, 3169.82, 3363.79, 3568.02, 3782.98, 4009.11, 4246.92, 4496.9,  # 24 °C
+  4759.56, 5035.43, 5325.08, 5629.06, 5947.96, 6282.38, 6632.95, 7000.31,  # 32 °C
+  7385.11, 7788.04, 8209.8, 8651.1, 9112.7, 9595.34, 10099.8, 10626.9,  # 40 °C
+  11177.5, 11752.4, 12352.5, 12978.6, 13631.8, 14312.9, 15022.9, 15762.8,  # 48 °C
+  16533.7, 17336.5, 18172.3, 19042.2, 19947.4, 20888.9, 21868, 22885.9,  # 56 °C
+  23943.7, 25042.7, 26184.3, 27369.7, 28600.2, 29877.2, 31202.2, 32576.5,  # 64 °C
+  34001.6, 35479, 37010.2, 38596.7, 40240.2, 41942.2, 43704.3, 45528.3,  # 72 °C
+  47415.8, 49368.6, 51388.4, 53477, 55636.3, 57868.1,  # 80 °C
+))
+SVP_MAX_C = SVP_MIN_C + (len(SVP_TABLE) - 1) * SVP_STEP_C
+
+def saturation_vapor_pressure_exact(temp_c):
+  """IAPWS saturation vapour pressure over water (Pa)."""
+  temp_k = temp_c + 273.15
+  v = 1 - (temp_k / CRITICAL_WATER_TEMPERATURE)
+  a1, a2, a3, a4, a5, a6 = -7.85951783, 1.84408259, -11.7866497, 22.6807411, -15.9618719, 1.80122502
+  return CRITICAL_WATER_PRESSURE * math.exp(
+    CRITICAL_WATER_TEMPERATURE / temp_k *
+    (a1*v + a2*v**1.5 + a3*v**3 + a4*v**3.5 + a5*v**4 + a6*v**7.5)
+  )
+
+def saturation_vapor_pressure(temp_c):
+  """Saturation vapour pressure (Pa) from the table, exact outside its range."""
+  if temp_c < SVP_MIN_C or temp_c > SVP_MAX_C:
+    return saturation_vapor_pressure_exact(temp_c)
+  x = (temp_c - SVP_MIN_C) / SVP_STEP_C
+  i = min(int(x), len(SVP_TABLE) - 2)
+  lo = SVP_TABLE[i]
+  return lo + (SVP_TABLE[i + 1] - lo) * (x - i)
+
+def adjust_humidity(rh, temp_c, new_temp_c):
+  """rh measured at temp_c, re-expressed at new_temp_c for the same air."""
+  return (rh * saturation_vapor_pressure(temp_c) / saturation_vapor_pressure(new_temp_c)
+          * (new_temp_c + 273.15) / (temp_c + 273.15))
+
+def _curve(points, x):
+  """A constant, or piecewise-linear through [(x, y), ...] (clamped at the ends)."""
+  if not isinstance(points, (list, tuple)):
+    return points
+  if x <= points[0][0]:
+    return points[0][1]
+  for (x0, y0), (x1, y1) in zip(points, points[1:]):
+    if x <= x1:
+      return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+  return points[-1][1]
+
+def profile():
+  """The device's calibration profile: config.calibration, or the legacy
+  usb_power_temperature_offset setting."""
+  calibration = config.calibration
+  if calibration is None:
+    calibration = {"temperature_offset": {"usb": config.usb_power_temperature_offset}}
+  return calibration
+
+def compensate(temperature, humidity, pressure, vbus_present):
+  """Returns (temperature °C, humidity %, pressure hPa) with the calibration
+  profile applied. humidity is re-expressed at the corrected temperature."""
+  calibration = profile()
+  offsets = calibration.get("temperature_offset", {})
+  offset = _curve(offsets.get("usb" if vbus_present else "batt", 0), temperature)
+  if offset:
+    adjusted = temperature - offset
+    humidity = adjust_humidity(humidity, temperature, adjusted)
+    temperature = adjusted
+
+  scale, trim = calibration.get("humidity_trim", (1, 0))
+  humidity = min(max(humidity * scale + trim, 0.0), 100.0)
+  pressure += calibration.get("pressure_trim", 0)
+  return round(temperature, 2), round(humidity, 2), round(pressure, 2)
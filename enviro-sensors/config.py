@@ -8,6 +8,8 @@ model = "indoor"
 wifi_ssid = ""
 wifi_password = ""
 wifi_country = "GB"
+wifi_fast_reconnect = True  # reuse the last access point + IP settings to skip scan/DHCP
+wifi_static_ip = None       # or ("192.168.1.50", "255.255.255.0", "192.168.1.1", "192.168.1.1")
 
 # Device identity
 nickname = f"enviro-{model}-1"
@@ -15,18 +17,99 @@ nickname = f"enviro-{model}-1"
 # Reading schedule
 reading_frequency = 5     # minutes between readings (aligned to clock grid)
 
+# Adaptive interval — while every key below has stayed within its tolerance
+# over the last adaptive_window readings, the interval doubles (up to
+# adaptive_max_multiple x reading_frequency); a change bigger than the
+# tolerance between two readings drops it straight back. Keep the longest
+# interval a divisor of 60 to stay on the clock grid.
+adaptive_interval = False
+adaptive_tolerance = {"temperature": 0.2, "humidity": 1.0, "pressure": 0.3}
+adaptive_window = 4
+adaptive_max_multiple = 4
+
+# Battery power policy — on battery, VSYS is measured each wake and the first
+# row whose min_volts it reaches sets (reading_frequency, upload_frequency)
+# for that cycle; upload_frequency None pauses uploads. None = always use the
+# values above. Intervals should divide 60 to stay on the clock grid.
+power_policy = None
+# power_policy = [
+#   (3.9, 5, 3),      # (min_volts, reading minutes, readings per upload)
+#   (3.6, 15, 4),
+#   (3.4, 30, 8),
+#   (0.0, 60, None),  # below 3.4 V: readings only, no uploads
+# ]
+
+# Local storage — "csv" appends text rows to readings/<date>.csv; "bin"
+# writes fixed-width rows to readings/<date>.bin (~1.6-1.9x smaller, seekable;
+# decode on a host with tools/read_archive.py)
+archive_format = "csv"
+compress_budget = 2       # seconds per wake spent gzipping previous days' CSV files (0 = off)
+
 # Upload settings
 upload_url = "https://example.com/upload"
 upload_frequency = 3      # cached readings before triggering upload
 http_username = None      # set for HTTP Basic Auth (or None)
 http_password = None
+upload_batch_bytes = 8192 # send queued readings as one JSON array of up to this
+                          # many bytes per POST (0 = one POST per reading)
+upload_timings = False      # attach rolling awake-time stats ("timings") to uploads
+upload_compression = False  # gzip POST bodies (needs firmware with the deflate module)
+upload_mode = "raw"       # "summary" uploads one count/min/max/mean/last record per
+                          # upload_frequency readings (raw data stays in readings/)
+upload_order = "oldest"   # "newest" sends the latest readings first after an
+                          # outage, then backfills the backlog oldest first
+upload_budget_seconds = 30  # per-wake limits on draining the queue; the rest is
+upload_budget_bytes = 0     # sent on later wakes (0 = no limit)
+upload_max_attempts = 3   # rejections (HTTP 400/413/415/422) before a reading is moved to dead/
+upload_retry_min = 15     # minutes before retrying a failed upload, doubling per
+upload_retry_max = 360    # consecutive failure up to this cap (low disk retries regardless)
+
+# Event triggers — a reading matching a rule is uploaded straight away
+# (ignoring upload_frequency) and another reading follows trigger_followup
+# minutes later, off the clock grid. "above" fires while the value exceeds
+# the threshold; "rise" when it has gone up by at least that much since the
+# previous reading.
+triggers = []
+# triggers = [
+#   {"key": "rain_per_second", "above": 0.01},  # weather
+#   {"key": "wind_gust", "above": 15},          # weather
+#   {"key": "pm2_5", "rise": 20},               # urban
+# ]
+trigger_followup = 1      # minutes
+
+# Weather board — anemometer averaging window. Pulses are counted by pin
+# interrupt, so a longer window costs awake time but no extra CPU.
+wind_sample_time = 1      # seconds
+
+# Urban board — added to 20·log10(mic RMS volts) to give noise_db. The
+# default is uncalibrated; adjust against a sound level meter.
+noise_db_offset = 80.0
+
+# Urban board — sample the microphone on core 1 (via _thread) from the start
+# of each cycle, overlapping clock sync, upload retries and flash writes.
+# The noise window then comes before the PMS5003I fan starts.
+dual_core_sampling = False
 
 # Clock
-resync_frequency = 24     # hours between NTP re-syncs
+resync_frequency = 24     # hours between NTP re-syncs until the RTC drift is known
+clock_max_error = 2       # seconds of drift allowed; sets the adaptive resync interval
+resync_min_hours = 1      # bounds for the adaptive resync interval
+resync_max_hours = 168
 
 # USB power compensation — the USB regulator heats the board, skewing
 # the temperature sensor. This offset is subtracted from the raw reading.
 usb_power_temperature_offset = 2.1
 
+# Calibration profile — replaces the offset above when set. Temperature
+# offsets (°C subtracted, per power mode) are a constant or a curve of
+# (sensor °C, offset) points; humidity is kept at the same absolute humidity
+# across the offset, then trimmed as (scale, offset). pressure_trim is hPa.
+calibration = None
+# calibration = {
+#   "temperature_offset": {"usb": [(10, 1.6), (30, 2.4)], "batt": 0.3},
+#   "humidity_trim": (1.02, -1.5),
+#   "pressure_trim": 0.8,
+# }
+
 # Silent mode — disables all LEDs (activity + warning)
 silent_mode = False
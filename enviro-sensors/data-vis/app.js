@@ -17,6 +17,8 @@ const SENSOR_META = {
   pm2_5:             { label: 'PM2.5',                 unit: '\u00b5g/m\u00b3', beginAtZero: true },
   pm10:              { label: 'PM10',                  unit: '\u00b5g/m\u00b3', beginAtZero: true },
   noise:             { label: 'Noise Level',           unit: '',      beginAtZero: true },
+  noise_rms:         { label: 'Noise RMS',             unit: 'V',     beginAtZero: true },
+  noise_db:          { label: 'Noise (approx.)',       unit: 'dB',    beginAtZero: false },
 };
 
 const COLORS = [
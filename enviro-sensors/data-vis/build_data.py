@@ -3,8 +3,9 @@
 
 Each Enviro device stores readings as individual timestamped JSON files inside
 a directory named ``{nickname}-{uid}/``.  This script scans for those
-directories, reads every JSON file in sorted (chronological) order, and writes
-a combined ``data.json`` keyed by device nickname.
+directories, reads every JSON file, and writes a combined ``data.json`` keyed
+by device nickname, with each device's readings in chronological order.  A file may also hold a JSON
+array of readings (a batched upload stored as-is) or newline-delimited JSON.
 
 Usage:
     python3 build_data.py [--dir DATA_DIR] [--out OUTPUT]
@@ -29,12 +30,26 @@ def find_device_dirs(base: str) -> list[str]:
     return sorted(glob.glob(os.path.join(base, DEVICE_DIR_PATTERN)))
 
 
+def load_file(path: str) -> list[dict]:
+    """Return the readings stored in *path* (object, array, or NDJSON)."""
+    with open(path) as fh:
+        text = fh.read()
+    try:
+        content = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return content if isinstance(content, list) else [content]
+
+
 def load_readings(device_dir: str) -> list[dict]:
-    """Load and return all JSON readings from *device_dir*, sorted by filename."""
+    """Load and return all JSON readings from *device_dir*, sorted by timestamp."""
     readings = []
     for path in sorted(glob.glob(os.path.join(device_dir, "*.json"))):
-        with open(path) as fh:
-            readings.append(json.load(fh))
+        readings.extend(load_file(path))
+    # Files are named by timestamp, so this is already in order unless a
+    # file holds readings uploaded newest-first; the sort is then a near
+    # linear merge of a few runs.
+    readings.sort(key=lambda r: r["timestamp"])
     return readings
 
 
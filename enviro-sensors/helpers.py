@@ -4,8 +4,10 @@
 
 import os
 import time
+import ujson
 import machine
 from machine import RTC
+from records import crc32
 
 def datetime_string():
   dt = RTC().datetime()
@@ -28,6 +30,30 @@ def timestamp_to_epoch(dt_str):
   second = int(dt_str[17:19])
   return time.mktime((year, month, day, hour, minute, second, 0, 0))
 
+def epoch_to_timestamp(epoch):
+  dt = time.gmtime(epoch)
+  return "{0:04d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}Z".format(*dt)
+
+def deadline(ms):
+  """Returns a ticks_ms value ms from now, for overlapping slow sensor phases."""
+  return time.ticks_add(time.ticks_ms(), ms)
+
+def wait_until(deadline):
+  """Sleep for whatever is left until deadline (returns at once if it has passed)."""
+  remaining = time.ticks_diff(deadline, time.ticks_ms())
+  if remaining > 0:
+    time.sleep_ms(remaining)
+
+def gzip_bytes(data):
+  """Gzip data with the firmware's deflate module (raises ImportError without it)."""
+  import deflate
+  import io
+  buf = io.BytesIO()
+  stream = deflate.DeflateIO(buf, deflate.GZIP, 10)  # 1 KB window keeps RAM use low
+  stream.write(data)
+  stream.close()
+  return buf.getvalue()
+
 def uid():
   return "{:02x}{:02x}{:02x}{:02x}{:02x}{:02x}{:02x}{:02x}".format(*machine.unique_id())
 
@@ -37,6 +63,34 @@ def file_exists(path):
   except OSError:
     return False
 
+def write_state(path, state):
+  """Write a small JSON state file atomically, with a CRC32 prefix.
+
+  The data goes to path.tmp and is renamed over path, so a brownout leaves
+  either the old or the new state, never a truncated file."""
+  text = ujson.dumps(state)
+  tmp = path + ".tmp"
+  with open(tmp, "w") as f:
+    f.write("{:08x} {}".format(crc32(text.encode()), text))
+  os.rename(tmp, path)
+
+def read_state(path):
+  """Returns the state saved by write_state(), or None if path is missing or
+  corrupt. Plain JSON written by earlier firmware is accepted."""
+  try:
+    with open(path, "r") as f:
+      text = f.read()
+  except OSError:
+    return None
+  try:
+    if text[8:9] == " " and not text.startswith("{"):
+      if int(text[:8], 16) != crc32(text[9:].encode()):
+        return None
+      text = text[9:]
+    return ujson.loads(text)
+  except ValueError:
+    return None
+
 def mkdir_safe(path):
   try:
     os.mkdir(path)
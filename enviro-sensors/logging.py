@@ -1,52 +1,65 @@
-# Minimal logging with aggressive rotation for MicroPython.
+# Minimal write-behind logging for MicroPython.
 # Replaces phew.logging — same API surface (info, error, debug).
+#
+# Lines are printed immediately but buffered in RAM, and written to flash by
+# flush() — once per cycle (before sleep and in the exception handler), or
+# early if the buffer grows past BUFFER_LIMIT. The log is a two-segment ring:
+# when log.txt passes SEGMENT_SIZE it is renamed to log.1.txt (replacing the
+# older segment) and a fresh log.txt is started, so rotation never copies data.
 
 import os
 
 LOG_FILE = "log.txt"
-MAX_SIZE = 4096       # rotate when log exceeds 4 KB
-KEEP_SIZE = 2048      # after rotation, keep ~last 2 KB
+OLD_LOG_FILE = "log.1.txt"
+SEGMENT_SIZE = 2048   # start a new segment past this size (~4 KB kept in total)
+BUFFER_LIMIT = 1024   # flush early if this many bytes are waiting
 _DEBUG = False        # set True to enable debug-level messages
 
+_buffer = []
+_buffered = 0
+_flushes = 0
+
 def _size():
   try:
     return os.stat(LOG_FILE)[6]
   except OSError:
     return 0
 
-def _rotate():
-  """Trim log file to KEEP_SIZE bytes (keeping the tail)."""
-  size = _size()
-  if size <= MAX_SIZE:
+def flush():
+  """Write buffered lines to flash (one append, plus a rename when rotating)."""
+  global _buffered, _flushes
+  if not _buffer:
     return
+  data = "".join(_buffer)
+  _buffer.clear()
+  _buffered = 0
   try:
-    with open(LOG_FILE, "r") as f:
-      f.seek(size - KEEP_SIZE)
-      f.readline()  # skip partial line
-      tail = f.read()
-    with open(LOG_FILE, "w") as f:
-      f.write("--- log rotated ---\n")
-      f.write(tail)
+    if _size() >= SEGMENT_SIZE:
+      os.rename(LOG_FILE, OLD_LOG_FILE)
+    with open(LOG_FILE, "a") as f:
+      f.write(data)
+    _flushes += 1
   except Exception:
-    # if rotation fails, just truncate
-    try:
-      with open(LOG_FILE, "w") as f:
-        f.write("--- log reset ---\n")
-    except Exception:
-      pass
+    pass
+
+def pop_flush_count():
+  """Number of flash writes since the last call (for the per-cycle log)."""
+  global _flushes
+  count = _flushes
+  _flushes = 0
+  return count
 
 def _write(level, msg):
+  global _buffered
   from machine import RTC
   dt = RTC().datetime()
   ts = "{0:04d}-{1:02d}-{2:02d} {4:02d}:{5:02d}:{6:02d}".format(*dt)
   line = "[" + ts + "] " + level + " " + str(msg)
   print(line)
-  try:
-    with open(LOG_FILE, "a") as f:
-      f.write(line + "\n")
-    _rotate()
-  except Exception:
-    pass
+  _buffer.append(line + "\n")
+  _buffered += len(line) + 1
+  if _buffered >= BUFFER_LIMIT:
+    flush()
 
 def info(msg):
   _write("I", msg)
@@ -59,8 +72,12 @@ def debug(msg):
     _write("D", msg)
 
 def truncate():
-  """Delete log file entirely."""
-  try:
-    os.remove(LOG_FILE)
-  except OSError:
-    pass
+  """Delete log files (and any buffered lines) entirely."""
+  global _buffered
+  _buffer.clear()
+  _buffered = 0
+  for path in (LOG_FILE, OLD_LOG_FILE):
+    try:
+      os.remove(path)
+    except OSError:
+      pass
@@ -9,6 +9,9 @@
 from machine import Pin, PWM, RTC, ADC
 hold_vsys_en_pin = Pin(2, Pin.OUT, value=True)
 
+import profiler
+boot_start = profiler.start()
+
 from time import sleep
 sleep(0.5)  # Issue #117: short delay on startup to ensure stable boot
 
@@ -26,6 +29,8 @@ from ucollections import OrderedDict
 import config
 import logging
 import helpers
+import upload_queue
+import archive
 
 # ============================================================
 # Hardware constants (common to all boards)
@@ -37,6 +42,7 @@ ACTIVITY_LED_PIN = 6
 BUTTON_PIN = 7
 RTC_ALARM_PIN = 8
 WIFI_CS_PIN = 25
+VSYS_ADC_PIN = 29  # VSYS / 3, shared with the WiFi chip's SPI clock
 
 # ============================================================
 # Hardware init
@@ -49,6 +55,7 @@ vbus_present = _vbus_pin.value()
 # reset I2C bus — after an unclean reset (e.g. USB disconnect) the bus
 # can be stuck mid-transaction. toggling SCL while SDA is released
 # sends enough clocks to unstick any peripheral.
+i2c_reset_start = profiler.start()
 _sda_reset = Pin(I2C_SDA_PIN, Pin.IN, Pin.PULL_UP)
 _scl_reset = Pin(I2C_SCL_PIN, Pin.OUT, value=1)
 for _ in range(16):
@@ -59,6 +66,7 @@ for _ in range(16):
 _sda_reset.init(Pin.IN)
 _scl_reset.init(Pin.IN)
 sleep(0.01)
+profiler.record("i2c_reset", i2c_reset_start)
 
 # I2C bus
 from pimoroni_i2c import PimoroniI2C
@@ -114,6 +122,56 @@ def warn_led_off():
 # ============================================================
 
 def connect_wifi():
+  start = profiler.start()
+  connected = _connect_wifi()
+  elapsed = profiler.record("wifi", start)
+  logging.info(f"> wifi connect took {elapsed // 1000}ms")
+  return connected
+
+WIFI_CACHE_FILE = "wifi.json"
+
+def load_wifi_cache():
+  """Returns the cached {"ssid", "bssid", "ifconfig"} for config.wifi_ssid, or None."""
+  cache = helpers.read_state(WIFI_CACHE_FILE)
+  return cache if cache and cache.get("ssid") == config.wifi_ssid else None
+
+def save_wifi_cache(wlan):
+  """Record the access point BSSID and IP settings of a fresh connection."""
+  import ubinascii
+  bssid = None
+  try:
+    # the cyw43 driver doesn't report the associated BSSID, so find the
+    # strongest AP for our SSID (a one-off cost whenever the cache is rebuilt)
+    best = None
+    for ssid, ap_bssid, channel, rssi, security, hidden in wlan.scan():
+      if ssid.decode() == config.wifi_ssid and (best is None or rssi > best[1]):
+        best = (ap_bssid, rssi)
+    if best:
+      bssid = ubinascii.hexlify(best[0]).decode()
+  except Exception as e:
+    logging.error(f"> wifi scan failed: {e}")
+
+  helpers.write_state(WIFI_CACHE_FILE, {"ssid": config.wifi_ssid, "bssid": bssid, "ifconfig": wlan.ifconfig()})
+
+def clear_wifi_cache():
+  if helpers.file_exists(WIFI_CACHE_FILE):
+    os.remove(WIFI_CACHE_FILE)
+
+def wait_for_link(wlan, timeout_ms):
+  """Poll until link up (True), an error state or timeout (False)."""
+  deadline = helpers.deadline(timeout_ms)
+  while time.ticks_diff(deadline, time.ticks_ms()) > 0:
+    sleep(0.1)
+    status = wlan.status()
+    if status == 3:  # CYW43_LINK_UP
+      return True
+    if status < 0:  # error state
+      logging.error(f"> wifi failed, status: {status}")
+      return False
+  logging.error("> wifi connection timed out")
+  return False
+
+def _connect_wifi():
   import network
   import rp2
 
@@ -133,22 +191,43 @@ def connect_wifi():
       if wlan.status() <= 0:
         break
 
+  if config.wifi_static_ip:
+    wlan.ifconfig(tuple(config.wifi_static_ip))
+
+  # fast path: associate directly with the last known access point and
+  # reuse its IP settings, skipping the scan and DHCP
+  cache = load_wifi_cache() if config.wifi_fast_reconnect else None
+  if cache:
+    import ubinascii
+    logging.info(f"> fast-connecting to wifi '{config.wifi_ssid}'")
+    if not config.wifi_static_ip:
+      wlan.ifconfig(tuple(cache["ifconfig"]))
+    if cache["bssid"]:
+      wlan.connect(config.wifi_ssid, config.wifi_password, bssid=ubinascii.unhexlify(cache["bssid"]))
+    else:
+      wlan.connect(config.wifi_ssid, config.wifi_password)
+    if wait_for_link(wlan, 3000):
+      logging.info(f"> wifi connected, IP: {wlan.ifconfig()[0]}")
+      return True
+
+    logging.error("> fast connect failed, falling back to full connect")
+    clear_wifi_cache()
+    wlan.disconnect()
+    wlan.active(False)  # drops the cached IP settings so DHCP runs again
+    wlan.active(True)
+    if config.wifi_static_ip:
+      wlan.ifconfig(tuple(config.wifi_static_ip))
+
   logging.info(f"> connecting to wifi '{config.wifi_ssid}'")
   wlan.connect(config.wifi_ssid, config.wifi_password)
 
-  for _ in range(20):  # 10 second timeout
-    sleep(0.5)
-    status = wlan.status()
-    if status == 3:  # CYW43_LINK_UP
-      ip = wlan.ifconfig()[0]
-      logging.info(f"> wifi connected, IP: {ip}")
-      return True
-    if status < 0:  # error state
-      logging.error(f"> wifi failed, status: {status}")
-      return False
+  if not wait_for_link(wlan, 10000):
+    return False
 
-  logging.error("> wifi connection timed out")
-  return False
+  logging.info(f"> wifi connected, IP: {wlan.ifconfig()[0]}")
+  if config.wifi_fast_reconnect:
+    save_wifi_cache(wlan)
+  return True
 
 def disconnect_wifi():
   import network
@@ -164,12 +243,16 @@ def disconnect_wifi():
 # NTP time sync
 # ============================================================
 
-def ntp_fetch():
-  """Fetch time from NTP server. Returns time tuple or None."""
+NTP_HOST = "pool.ntp.org"
+SYNC_FILE = "sync_time.txt"
+
+def ntp_fetch(host=NTP_HOST):
+  """Fetch time from NTP server. Returns (time tuple, server IP) or (None, None)."""
+  start = profiler.start()
   try:
     query = bytearray(48)
     query[0] = 0x1b
-    addr = usocket.getaddrinfo("pool.ntp.org", 123)[0][-1]
+    addr = usocket.getaddrinfo(host, 123)[0][-1]
     sock = usocket.socket(usocket.AF_INET, usocket.SOCK_DGRAM)
     sock.settimeout(10)
     sock.sendto(query, addr)
@@ -177,22 +260,69 @@ def ntp_fetch():
     sock.close()
     ntp_epoch_offset = 2208988800
     ts = struct.unpack("!I", data[40:44])[0] - ntp_epoch_offset
-    return time.gmtime(ts)
+    return time.gmtime(ts), addr[0]
   except Exception as e:
-    logging.error(f"> NTP fetch failed: {e}")
-    return None
-
-def sync_clock_from_ntp():
-  """Connect WiFi, fetch NTP time, write to external RTC. Returns True on success."""
-  if not connect_wifi():
-    return False
-
-  ts = ntp_fetch()
-  disconnect_wifi()
+    logging.error(f"> NTP fetch from {host} failed: {e}")
+    return None, None
+  finally:
+    profiler.record("ntp", start)
 
+def load_clock_state():
+  """Returns the last sync record {"synced", "drift_ppm", "interval", "ntp_ip"}, or None."""
+  state = helpers.read_state(SYNC_FILE)
+  if state is None:
+    try:
+      with open(SYNC_FILE, "r") as f:
+        text = f.read().strip()
+    except OSError:
+      return None
+    if len(text) == 20 and text.endswith("Z"):
+      return {"synced": text}  # plain timestamp from earlier firmware
+  return state
+
+def save_clock_state(state, ntp_epoch, offset, ntp_ip):
+  """Record a sync: update the RTC drift estimate and derive the next interval.
+
+  offset is NTP time minus RTC time (seconds) just before the RTC was set."""
+  drift = state.get("drift_ppm")
+  if state.get("synced"):
+    elapsed = ntp_epoch - helpers.timestamp_to_epoch(state["synced"])
+    # ignore short spans (1s RTC resolution) and offsets from a reset RTC
+    if elapsed >= 3600 and abs(offset) < 60:
+      measured = offset / elapsed * 1000000
+      drift = measured if drift is None else (drift + measured) / 2
+
+  interval = config.resync_frequency * 3600
+  if drift is not None:
+    interval = config.clock_max_error / max(abs(drift), 0.1) * 1000000
+    interval = min(max(interval, config.resync_min_hours * 3600), config.resync_max_hours * 3600)
+
+  helpers.write_state(SYNC_FILE, {
+    "synced": helpers.epoch_to_timestamp(ntp_epoch),
+    "drift_ppm": None if drift is None else round(drift, 2),
+    "interval": int(interval),
+    "ntp_ip": ntp_ip,
+  })
+
+  drift_str = "unknown" if drift is None else f"{drift:.1f}ppm"
+  logging.info(f"> RTC offset {offset}s, drift {drift_str}, next sync in {int(interval) // 3600}h")
+
+def set_clock_from_ntp():
+  """Fetch NTP time over the current WiFi connection and write it to the RTC."""
+  state = load_clock_state() or {}
+
+  ts = None
+  ntp_ip = state.get("ntp_ip")
+  if ntp_ip:
+    ts, ntp_ip = ntp_fetch(ntp_ip)  # cached server address skips the DNS lookup
+  if not ts:
+    ts, ntp_ip = ntp_fetch()
   if not ts:
     return False
 
+  t = rtc.datetime()
+  rtc_epoch = time.mktime((t[0], t[1], t[2], t[3], t[4], t[5], 0, 0))
+
   # stop RTC, set time, restart
   i2c.writeto_mem(0x51, 0x00, b'\x10')
   rtc.datetime(ts)
@@ -203,49 +333,70 @@ def sync_clock_from_ntp():
   dt = rtc.datetime()
   if dt != ts[0:7]:
     logging.error("> failed to set RTC time")
-    if helpers.file_exists("sync_time.txt"):
-      os.remove("sync_time.txt")
+    if helpers.file_exists(SYNC_FILE):
+      os.remove(SYNC_FILE)
     return False
 
   # sync Pico internal RTC too
   RTC().datetime((ts[0], ts[1], ts[2], ts[6], ts[3], ts[4], ts[5], 0))
 
-  # record sync time
-  with open("sync_time.txt", "w") as f:
-    f.write("{0:04d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}Z".format(*ts))
-
+  ntp_epoch = time.mktime(ts)
+  save_clock_state(state, ntp_epoch, ntp_epoch - rtc_epoch, ntp_ip)
   logging.info("> RTC synced via NTP")
   return True
 
+def sync_clock_from_ntp():
+  """Connect WiFi, fetch NTP time, write to external RTC. Returns True on success."""
+  if not connect_wifi():
+    return False
+
+  try:
+    return set_clock_from_ntp()
+  finally:
+    disconnect_wifi()
+
+def clock_sync_due(fraction=1.0):
+  """True once fraction of the current resync interval has passed since the last sync."""
+  state = load_clock_state()
+  if not state or not state.get("synced"):
+    return True
+  now = helpers.timestamp_to_epoch(helpers.datetime_string())
+  age_seconds = now - helpers.timestamp_to_epoch(state["synced"])
+  interval = state.get("interval") or config.resync_frequency * 3600
+  return age_seconds < 0 or age_seconds >= interval * fraction
+
 def is_clock_set():
   """Returns True if RTC has a valid recent time and NTP sync is fresh."""
   if rtc.datetime()[0] <= 2020:
     return False
 
-  if helpers.file_exists("sync_time.txt"):
-    now = helpers.timestamp_to_epoch(helpers.datetime_string())
-    with open("sync_time.txt", "r") as f:
-      sync_str = f.read().strip()
-    if sync_str:
-      sync = helpers.timestamp_to_epoch(sync_str)
-      age_seconds = now - sync
-      if age_seconds >= 0 and age_seconds < (config.resync_frequency * 3600):
-        return True
-      logging.info(f"> NTP sync is {age_seconds}s old, needs refresh")
+  if clock_sync_due():
+    logging.info("> NTP sync is missing or older than the resync interval")
+    return False
 
-  return False
+  return True
 
 # ============================================================
-# Local CSV storage
+# Local storage (CSV or binary archive)
 # ============================================================
 
 def save_reading_locally(readings):
   helpers.mkdir_safe("readings")
 
-  # write column headings once
-  if not helpers.file_exists("readings/columns.txt"):
+  if config.archive_format == "bin":
+    epoch = helpers.timestamp_to_epoch(helpers.datetime_string())
+    archive.append(f"readings/{helpers.date_string()}.bin", epoch, readings)
+    return
+
+  # write column headings once (and again if a firmware update adds keys)
+  columns = "timestamp," + ",".join(readings.keys()) + "\n"
+  existing = None
+  if helpers.file_exists("readings/columns.txt"):
+    with open("readings/columns.txt", "r") as f:
+      existing = f.read()
+  if existing != columns:
     with open("readings/columns.txt", "w") as f:
-      f.write("timestamp," + ",".join(readings.keys()) + "\n")
+      f.write(columns)
 
   filename = f"readings/{helpers.date_string()}.csv"
   with open(filename, "a") as f:
@@ -254,38 +405,343 @@ def save_reading_locally(readings):
       row.append(str(readings[key]))
     f.write(",".join(row) + "\n")
 
+# ============================================================
+# Housekeeping — compress CSV files from previous days
+# ============================================================
+
+COMPRESS_CHUNK = 4096  # bytes of CSV per gzip member
+HOUSEKEEPING_FILE = "readings/housekeeping.txt"  # date of the last completed pass
+
+def compress_file(path, deadline):
+  """Gzip path into path.gz one chunk at a time. Returns True once done.
+
+  Each chunk of whole rows is written as its own gzip member (a multi-member
+  .gz file is still a valid gzip stream), with the source offset saved in
+  path.pos, so running out of time just resumes on the next wake."""
+  gz_path = path + ".gz"
+  pos_path = path + ".pos"
+  offset = 0
+  try:
+    with open(pos_path, "r") as f:
+      offset = int(f.read())
+  except (OSError, ValueError):
+    if helpers.file_exists(gz_path):
+      os.remove(gz_path)  # partial output without a position — start over
+
+  size = os.stat(path)[6]
+  with open(path, "rb") as src:
+    src.seek(offset)
+    while offset < size:
+      if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+        return False
+      chunk = src.read(COMPRESS_CHUNK)
+      if offset + len(chunk) < size:
+        # end each chunk on a row boundary so a chunk repeated after a
+        # brownout repeats whole rows, never half of one
+        end = chunk.rfind(b"\n") + 1
+        if end:
+          chunk = chunk[:end]
+          src.seek(offset + end)
+      with open(gz_path, "ab") as dst:
+        dst.write(helpers.gzip_bytes(chunk))
+      offset += len(chunk)
+      with open(pos_path, "w") as f:
+        f.write(str(offset))
+
+  os.remove(path)
+  if helpers.file_exists(pos_path):
+    os.remove(pos_path)
+  logging.info(f"> compressed {path}: {size} -> {os.stat(gz_path)[6]} bytes")
+  return True
+
+def compress_old_readings():
+  """Compress readings/*.csv from previous days within config.compress_budget."""
+  if not config.compress_budget:
+    return
+
+  today = helpers.date_string()
+  try:
+    with open(HOUSEKEEPING_FILE, "r") as f:
+      if f.read().strip() == today:
+        return  # already done today
+  except OSError:
+    pass
+
+  start = profiler.start()
+  deadline = helpers.deadline(config.compress_budget * 1000)
+  try:
+    for name in sorted(os.listdir("readings")):
+      if not name.endswith(".csv") or name == f"{today}.csv":
+        continue
+      if not compress_file(f"readings/{name}", deadline):
+        logging.info("> compression budget used, resuming next wake")
+        return
+  except ImportError:
+    logging.error("> deflate module unavailable, not compressing readings")
+  except OSError as e:
+    logging.error(f"> compressing readings failed: {e}")
+    return
+  finally:
+    profiler.record("housekeeping", start)
+
+  with open(HOUSEKEEPING_FILE, "w") as f:
+    f.write(today)
+
 # ============================================================
 # Upload cache and HTTP POST
 # ============================================================
 
-def cache_reading(readings):
-  """Save reading as JSON for later upload."""
+def cache_reading(readings, trigger=False, interval=None):
+  """Append reading to the upload queue."""
+  meta = OrderedDict({
+    "timestamp": helpers.timestamp_to_epoch(helpers.datetime_string()),
+    "usb": 1 if vbus_present else 0,
+    "free_space": helpers.free_space(),
+  })
+  if config.triggers:
+    meta["trigger"] = 1 if trigger else 0
+  if interval is not None:
+    meta["interval"] = interval
+  upload_queue.enqueue(meta, readings)
+
+SUMMARY_FILE = "summary.json"  # running aggregates for upload_mode = "summary"
+
+def summarise_reading(readings, trigger, interval, window):
+  """Fold a reading into the running summary (count, min, max, mean, last
+  per key). Once window readings have been folded in, or on a trigger, the
+  summary is queued as one aggregate record and a new one started. Returns
+  True if a summary was queued."""
+  now = helpers.timestamp_to_epoch(helpers.datetime_string())
+  state = helpers.read_state(SUMMARY_FILE) or {"start": now, "count": 0, "trigger": 0, "stats": {}}
+  state["count"] += 1
+  state["end"] = now
+  if trigger:
+    state["trigger"] = 1
+  stats = state["stats"]
+  for key, value in readings.items():
+    if value is None:
+      continue
+    s = stats.get(key)
+    if s is None:
+      stats[key] = [value, value, value, 1, value]  # min, max, sum, n, last
+    else:
+      stats[key] = [min(s[0], value), max(s[1], value), s[2] + value, s[3] + 1, value]
+
+  if state["count"] < window and not trigger:
+    helpers.write_state(SUMMARY_FILE, state)
+    logging.info(f"> {state['count']} of {window} reading(s) in upload summary")
+    return False
+
+  meta = OrderedDict({
+    "timestamp": state["start"],
+    "usb": 1 if vbus_present else 0,
+    "free_space": helpers.free_space(),
+  })
+  if config.triggers:
+    meta["trigger"] = state["trigger"]
+  if interval is not None:
+    meta["interval"] = interval
+  meta["samples"] = state["count"]
+  meta["end"] = state["end"]
+  meta["min"] = {}
+  meta["max"] = {}
+  meta["last"] = {}
+  means = OrderedDict()
+  # reading key order first (the state file doesn't keep order)
+  for key in list(readings.keys()) + [k for k in stats if k not in readings]:
+    s = stats.get(key)
+    if s is None:
+      means[key] = None
+      continue
+    meta["min"][key], meta["max"][key], means[key], meta["last"][key] = s[0], s[1], s[2] / s[3], s[4]
+  upload_queue.enqueue(meta, means)
+  if helpers.file_exists(SUMMARY_FILE):
+    os.remove(SUMMARY_FILE)
+  logging.info(f"> queued summary of {state['count']} reading(s)")
+  return True
+
+def build_payload(meta, readings):
+  """Expand a queued record into the JSON payload sent to upload_url."""
   payload = {
     "nickname": config.nickname,
-    "timestamp": helpers.datetime_string(),
+    "timestamp": helpers.epoch_to_timestamp(meta["timestamp"]),
     "readings": readings,
     "model": config.model,
     "uid": helpers.uid(),
-    "power_mode": "usb" if vbus_present else "batt",
-    "free_space": helpers.free_space(),
+    "power_mode": "usb" if meta["usb"] else "batt",
+    "free_space": meta["free_space"],
   }
-  helpers.mkdir_safe("uploads")
-  filename = f"uploads/{helpers.datetime_file_string()}.json"
-  with open(filename, "w") as f:
-    f.write(ujson.dumps(payload))
-
-def cached_upload_count():
+  if meta.get("trigger"):
+    payload["trigger"] = True
+  if meta.get("interval") is not None:
+    payload["interval"] = meta["interval"]
+  if (meta.get("samples") or 1) > 1:
+    # compacted record: readings are means over samples readings
+    payload["aggregate"] = {
+      "samples": meta["samples"],
+      "end": helpers.epoch_to_timestamp(meta["end"]),
+      "min": meta["min"],
+      "max": meta["max"],
+    }
+    if "last" in meta:
+      payload["aggregate"]["last"] = meta["last"]
+  return payload
+
+def import_legacy_uploads():
+  """Move uploads/*.json files written by earlier firmware into the queue."""
   try:
-    return len(os.listdir("uploads"))
+    files = sorted(os.listdir("uploads"))
   except OSError:
-    return 0
+    return
+
+  for fname in files:
+    fpath = f"uploads/{fname}"
+    try:
+      with open(fpath, "r") as f:
+        payload = ujson.load(f)
+      meta = OrderedDict({
+        "timestamp": helpers.timestamp_to_epoch(payload["timestamp"]),
+        "usb": 1 if payload.get("power_mode") == "usb" else 0,
+        "free_space": payload.get("free_space"),
+      })
+      upload_queue.enqueue(meta, payload["readings"])
+    except Exception as e:
+      logging.error(f"  - could not import {fname}: {e}")
+    os.remove(fpath)
 
-def upload_cached_readings():
-  """Upload all cached JSON files. Returns True if all succeeded."""
-  count = cached_upload_count()
+  os.rmdir("uploads")
+  logging.info(f"> imported {len(files)} cached reading(s) into upload queue")
+
+UPLOAD_CHUNK = 50  # queued records decoded into RAM at a time
+RETRY_FILE = "reattempt_upload.txt"  # backoff state while uploads are failing
+
+def load_upload_backoff():
+  """Returns {"failures", "next"} while uploads are failing, else None."""
+  if not helpers.file_exists(RETRY_FILE):
+    return None
+  # an empty sentinel from earlier firmware (or a corrupt file) means retry now
+  return helpers.read_state(RETRY_FILE) or {"failures": 0, "next": 0}
+
+def record_upload_failure():
+  """Push the next attempt back: upload_retry_min minutes, doubling per
+  consecutive failure up to upload_retry_max."""
+  state = load_upload_backoff() or {"failures": 0}
+  failures = state["failures"] + 1
+  delay = min(config.upload_retry_min * 2 ** (failures - 1), config.upload_retry_max)
+  now = helpers.timestamp_to_epoch(helpers.datetime_string())
+  helpers.write_state(RETRY_FILE, {"failures": failures, "next": now + delay * 60})
+  logging.error(f"> upload failed {failures} time(s) in a row, next attempt in {delay} min")
+
+def clear_upload_backoff():
+  if helpers.file_exists(RETRY_FILE):
+    os.remove(RETRY_FILE)
+
+def upload_payload(meta, readings, first, pending):
+  """build_payload() plus the extras carried once per POST (the first payload)."""
+  payload = build_payload(meta, readings)
+  if first:
+    payload["pending"] = pending
+    if config.upload_timings:
+      payload["timings"] = profiler.summary()
+  return payload
+
+def next_upload_batch(pending, recent=False, single=False):
+  """Returns (count, body) for the next POST.
+
+  With upload_batch_bytes set, as many queued readings as fit under the cap
+  are sent as one JSON array; otherwise (or with single) one reading is sent
+  as an object. recent takes readings from upload_queue.peek_recent()
+  instead of the oldest first. count includes corrupt records, which are
+  skipped; body is None if there was nothing else."""
+  single = single or not config.upload_batch_bytes
+  limit = 1 if single else UPLOAD_CHUNK
+  records = upload_queue.peek_recent(limit) if recent else upload_queue.peek(limit)
+  if not records:
+    return 0, None
+
+  n = 0
+  corrupt = 0
+  parts = []
+  size = 2
+  for record in records:
+    if record is None:
+      n += 1
+      corrupt += 1
+      continue
+    meta, readings = record
+    part = ujson.dumps(upload_payload(meta, readings, not parts, pending))
+    if parts and size + len(part) + 1 > config.upload_batch_bytes:
+      break
+    parts.append(part)
+    size += len(part) + 1
+    n += 1
+    if single:
+      break
+  if corrupt:
+    logging.error(f"  - skipping {corrupt} corrupt cached record(s)")
+  if not parts:
+    return n, None
+  return n, parts[0] if single else "[" + ",".join(parts) + "]"
+
+DEAD_DIR = "dead"  # readings the server kept rejecting, one JSON file each
+# statuses meaning the server objects to the content; any other failure
+# (network, 5xx, auth, wrong URL) stops the upload and backs off
+REJECTED_STATUSES = (400, 413, 415, 422)
+
+def quarantine_reading(reason):
+  """Move the oldest queued reading to DEAD_DIR so it stops blocking the queue."""
+  record = upload_queue.peek(1)[0]
+  if record is None:
+    upload_queue.advance(1)  # corrupt — nothing worth keeping
+    return
+  meta, readings = record
+  try:
+    text = ujson.dumps({"reason": reason, "payload": build_payload(meta, readings)})
+  except (ValueError, TypeError):
+    text = ujson.dumps({"reason": reason, "record": str((meta, readings))})
+  helpers.mkdir_safe(DEAD_DIR)
+  with open(f"{DEAD_DIR}/{meta['timestamp']}.json", "w") as f:
+    f.write(text)
+  upload_queue.advance(1)
+  logging.error(f"  - reading {helpers.epoch_to_timestamp(meta['timestamp'])} moved to {DEAD_DIR}/ ({reason})")
+
+def compress_body(body):
+  """Gzip body with the firmware's deflate module. Returns None if unavailable."""
+  try:
+    return helpers.gzip_bytes(body)
+  except (ImportError, AttributeError, OSError) as e:
+    logging.error(f"> compression unavailable, sending uncompressed: {e}")
+    return None
+
+def upload_cached_readings(force=False):
+  """Upload all queued readings. Returns True if all succeeded.
+
+  After a failure, attempts are skipped (returning False) until the backoff
+  in RETRY_FILE expires, unless force is set (e.g. the disk is filling up)."""
+  count = upload_queue.count()
   if count == 0:
+    clear_upload_backoff()
     return True
 
+  backoff = load_upload_backoff()
+  if backoff and not force:
+    wait = backoff["next"] - helpers.timestamp_to_epoch(helpers.datetime_string())
+    if wait > 0:
+      logging.info(f"> {count} reading(s) pending, upload backing off for {wait // 60 + 1} min")
+      return False
+
+  start = profiler.start()
+  try:
+    ok = _upload_cached_readings(count)
+  finally:
+    profiler.record("upload", start)
+  if ok:
+    clear_upload_backoff()
+  else:
+    record_upload_failure()
+  return ok
+
+def _upload_cached_readings(count):
   if not connect_wifi():
     logging.error("> cannot upload, wifi failed")
     return False
@@ -294,33 +750,100 @@ def upload_cached_readings():
 
   logging.info(f"> uploading {count} cached reading(s) to {config.upload_url}")
 
+  auth = None
+  if config.http_username:
+    auth = (config.http_username, config.http_password)
+  headers = {"Content-Type": "application/json"}
+
+  # per-wake budget — a long backlog is drained over several wakes rather
+  # than keeping the radio on for minutes; the queue head marks where to resume
+  deadline = helpers.deadline(config.upload_budget_seconds * 1000) if config.upload_budget_seconds else None
+  sent = 0
+  sent_bytes = 0
+  # after the server rejects a batch, send one reading per POST for the
+  # rest of this upload to find the reading it objects to
+  single = False
+
   all_ok = True
   try:
-    files = sorted(os.listdir("uploads"))
-    for fname in files:
-      fpath = f"uploads/{fname}"
+    # WiFi is already up — resync the clock early rather than spending a
+    # dedicated radio session on it later
+    if clock_sync_due(0.5):
+      set_clock_from_ntp()
+
+    while True:
+      if deadline is not None and time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+        logging.info(f"> upload time budget used, {count - sent} reading(s) left for next wake")
+        break
+      if config.upload_budget_bytes and sent_bytes >= config.upload_budget_bytes:
+        logging.info(f"> upload byte budget used, {count - sent} reading(s) left for next wake")
+        break
+      # newest-first: current readings go ahead of the backlog, which is
+      # then backfilled oldest first
+      recent = config.upload_order == "newest" and not single
       try:
-        with open(fpath, "r") as f:
-          payload = ujson.load(f)
-
-        auth = None
-        if config.http_username:
-          auth = (config.http_username, config.http_password)
-
-        result = urequests.post(config.upload_url, auth=auth, json=payload)
+        n, body = next_upload_batch(count - sent, recent, single)
+        if n == 0 and recent:
+          recent = False
+          n, body = next_upload_batch(count - sent)
+      except (ValueError, TypeError) as e:
+        # a reading that can't be encoded — never going to upload
+        if not single:
+          single = True
+        else:
+          quarantine_reading(f"encode error: {e}")
+        continue
+      if n == 0:
+        break
+      if body is None:
+        # only corrupt records — drop them without a POST
+        if recent:
+          upload_queue.advance_recent(n)
+        else:
+          upload_queue.advance(n)
+        sent += n
+        continue
+      try:
+        post_headers = headers
+        if config.upload_compression:
+          compressed = compress_body(body)
+          if compressed is not None:
+            body = compressed
+            post_headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+        result = urequests.post(config.upload_url, auth=auth, data=body, headers=post_headers)
         status = result.status_code
         result.close()
 
         if status in (200, 201, 202):
-          os.remove(fpath)
-          logging.info(f"  - uploaded {fname}")
+          if recent:
+            upload_queue.advance_recent(n)
+          else:
+            upload_queue.advance(n)
+          sent += n
+          sent_bytes += len(body)
+          logging.info(f"  - uploaded {n} reading(s), {len(body)} bytes ({sent}/{count})")
+        elif status in REJECTED_STATUSES:
+          # the server rejected the content (413: the batch was too big) —
+          # retrying it unchanged won't help
+          if n > 1 or recent:
+            logging.error(f"  - upload rejected for {n} reading(s) (HTTP {status}), sending one at a time")
+            single = True
+            continue
+          attempts = upload_queue.failed_attempt()
+          if attempts >= config.upload_max_attempts:
+            quarantine_reading(f"HTTP {status} after {attempts} attempts")
+            continue
+          logging.error(f"  - upload rejected (HTTP {status}), attempt {attempts} of {config.upload_max_attempts}")
+          all_ok = False
+          break
         else:
-          logging.error(f"  - upload failed for {fname} (HTTP {status})")
+          logging.error(f"  - upload failed for {n} reading(s) (HTTP {status})")
           all_ok = False
           break  # stop on first failure, retry next cycle
 
       except Exception as e:
-        logging.error(f"  - upload error for {fname}: {e}")
+        logging.error(f"  - upload error for {n} reading(s): {e}")
         all_ok = False
         break
 
@@ -329,6 +852,103 @@ def upload_cached_readings():
 
   return all_ok
 
+# ============================================================
+# Power policy — reading and upload cadence from battery voltage
+# ============================================================
+
+# cadence for this cycle (set from config.power_policy on battery)
+reading_frequency = config.reading_frequency
+upload_frequency = config.upload_frequency
+
+def read_vsys():
+  """VSYS in volts, averaged over 10 samples. The ADC pin doubles as the
+  WiFi SPI clock, so this must run while WiFi is off."""
+  Pin(WIFI_CS_PIN, Pin.OUT, value=True)  # deselect the WiFi chip; left driven high
+  adc = ADC(VSYS_ADC_PIN)
+  total = 0
+  for _ in range(10):
+    total += adc.read_u16()
+  # return GPIO29 from ADC input to its PIO function (alt 7) as the WiFi clock
+  Pin(VSYS_ADC_PIN, Pin.ALT, pull=Pin.PULL_DOWN, alt=7)
+  return total / 10 * 3 * 3.3 / 65535
+
+def select_power_policy(volts):
+  """Returns (reading_frequency, upload_frequency) for volts from the
+  config.power_policy table; upload_frequency None pauses uploads."""
+  rows = sorted(config.power_policy, key=lambda row: row[0], reverse=True)
+  for min_volts, reading, upload in rows:
+    if volts >= min_volts:
+      return reading, upload
+  return rows[-1][1], rows[-1][2]
+
+# ============================================================
+# Event triggers — expedited upload and an extra reading
+# ============================================================
+
+LAST_READING_FILE = "last_reading.json"  # "rise" rule keys from the previous reading
+
+# rules that fired for this cycle's reading
+triggered = []
+
+def check_triggers(reading):
+  """Returns descriptions of the config.triggers rules that reading fires."""
+  if not config.triggers:
+    return []
+  # only "rise" rules compare against the previous reading
+  rise_keys = [rule["key"] for rule in config.triggers if "rise" in rule]
+  previous = {}
+  if rise_keys:
+    previous = helpers.read_state(LAST_READING_FILE) or {}
+  fired = []
+  for rule in config.triggers:
+    key = rule["key"]
+    value = reading.get(key)
+    if value is None:
+      continue
+    if "above" in rule and value > rule["above"]:
+      fired.append(f"{key} {value} > {rule['above']}")
+    last = previous.get(key)
+    if "rise" in rule and last is not None and value - last >= rule["rise"]:
+      fired.append(f"{key} rose {last} -> {value}")
+  if rise_keys:
+    helpers.write_state(LAST_READING_FILE, {key: reading.get(key) for key in rise_keys})
+  return fired
+
+# ============================================================
+# Adaptive interval — fewer wakes while readings are stable
+# ============================================================
+
+ADAPTIVE_FILE = "adaptive.json"  # {"multiple", "window": {key: [recent values]}}
+
+def adapt_interval(reading, reset=False):
+  """Update the rolling window with reading and return the interval
+  multiple for the next sleep: doubled (up to adaptive_max_multiple) while
+  every tracked key stays within its tolerance across the window, back to 1
+  as soon as one moves by more than its tolerance between readings."""
+  state = helpers.read_state(ADAPTIVE_FILE) or {"multiple": 1, "window": {}}
+  window = state["window"]
+  changing = reset
+  stable = True
+  for key, tolerance in config.adaptive_tolerance.items():
+    value = reading.get(key)
+    if value is None:
+      continue
+    values = window.get(key, [])
+    if values and abs(value - values[-1]) > tolerance:
+      changing = True
+    values = (values + [value])[-config.adaptive_window:]
+    window[key] = values
+    if len(values) < config.adaptive_window or max(values) - min(values) > tolerance:
+      stable = False
+
+  multiple = state["multiple"]
+  if changing:
+    multiple = 1
+  elif stable:
+    multiple = min(multiple * 2, config.adaptive_max_multiple)
+  helpers.write_state(ADAPTIVE_FILE, {"multiple": multiple, "window": window})
+  return multiple
+
 # ============================================================
 # Sleep / wait for next reading
 # ============================================================
@@ -341,8 +961,12 @@ def calculate_next_reading():
   if second > 55:
     minute += 1
 
-  minute = math.floor(minute / config.reading_frequency) * config.reading_frequency
-  minute += config.reading_frequency
+  if triggered:
+    # extra reading soon after an event, off the grid
+    minute += config.trigger_followup
+  else:
+    minute = math.floor(minute / reading_frequency) * reading_frequency
+    minute += reading_frequency
 
   while minute >= 60:
     minute -= 60
@@ -363,13 +987,16 @@ def do_sleep():
   hour, minute, wait_seconds = calculate_next_reading()
   ampm = "am" if hour < 12 else "pm"
 
-  os.sync()
-  gc.collect()
+  logging.info(f"> awake timings (ms): {profiler.current_ms()}")
+  logging.info(f"> early log flushes this cycle: {logging.pop_flush_count()}")  # besides the one before sleep
+  profiler.save()
   led_off()
 
   if not vbus_present:
     # battery path: set RTC alarm and power off
     logging.info(f"> alarm set for {hour:02}:{minute:02}{ampm}, powering off")
+    logging.flush()
+    os.sync()
     rtc.clear_timer_flag()
     rtc.clear_alarm_flag()
     rtc.set_alarm(0, minute, hour)
@@ -381,6 +1008,9 @@ def do_sleep():
   else:
     # USB path: simple sleep, no I2C polling, no machine.reset()
     logging.info(f"> sleeping {wait_seconds}s until {hour:02}:{minute:02}{ampm}")
+    logging.flush()
+    os.sync()
+    gc.collect()
     sleep(wait_seconds)
     logging.info("> waking up")
 
@@ -391,10 +1021,16 @@ def do_sleep():
 logging.info(f"> enviro {config.model} custom firmware starting")
 logging.info(f"> uid: {helpers.uid()}, usb: {vbus_present}")
 
+import_legacy_uploads()
+
 consecutive_errors = 0
 MAX_CONSECUTIVE_ERRORS = 3  # flash red LED after this many failures in a row
 
+profiler.record("boot", boot_start)
+
 while True:
+  cycle_start = profiler.start()
+  logging.pop_flush_count()  # drop the flushes of the previous cycle's sleep
   try:
     gc.collect()
     led_on()
@@ -402,51 +1038,59 @@ while True:
     # ---- re-check power source each cycle ----
     vbus_present = _vbus_pin.value()
 
+    triggered = []
+
+    # ---- power policy (battery only) ----
+    reading_frequency = config.reading_frequency
+    upload_frequency = config.upload_frequency
+    if config.power_policy and not vbus_present:
+      volts = read_vsys()
+      reading_frequency, upload_frequency = select_power_policy(volts)
+      uploads = "paused" if upload_frequency is None else f"every {upload_frequency} reading(s)"
+      logging.info(f"> vsys {volts:.2f}V: reading every {reading_frequency} min, uploads {uploads}")
+
+    # ---- long sensor windows on core 1 (overlap the network work below) ----
+    if hasattr(board, 'start_sampling'):
+      board.start_sampling()
+
     # ---- clock sync ----
     if not is_clock_set():
       logging.info("> clock not set or stale, syncing via NTP")
       if not sync_clock_from_ntp():
         logging.error("> NTP sync failed, retrying in 60s")
+        logging.flush()
         led_off()
         sleep(60)
         continue
 
-    # ---- retry pending uploads ----
-    if helpers.file_exists("reattempt_upload.txt"):
-      logging.info(f"> retrying {cached_upload_count()} pending upload(s)")
+    # ---- retry pending uploads (spaced out by the backoff) ----
+    if upload_frequency is not None and helpers.file_exists(RETRY_FILE):
       if upload_cached_readings():
-        os.remove("reattempt_upload.txt")
         logging.info("> retry upload successful")
-      else:
-        logging.error("> retry upload failed, will try again next cycle")
 
     # ---- disk space check ----
     if helpers.low_disk_space():
       logging.error("> low disk space, attempting upload to free cache")
-      if upload_cached_readings():
-        # uploads freed space, clear retry sentinel if present
-        if helpers.file_exists("reattempt_upload.txt"):
-          os.remove("reattempt_upload.txt")
-      else:
-        # uploads failed too — thin out cached JSON files to free space
-        # removes every other file, halving the cache while preserving
-        # coverage across the full time range (reduced resolution, not data loss)
-        logging.error("> upload failed and disk is low, thinning cache")
+      if upload_frequency is None or not upload_cached_readings(force=True):
+        # uploads failed too — compact the queue to free space. adjacent
+        # readings are merged into min/mean/max aggregates, so coverage of the
+        # full time range is kept at reduced resolution; each further pass
+        # (while the disk stays low) halves the queue again
+        logging.error("> upload failed and disk is low, compacting cache")
         try:
-          files = sorted(os.listdir("uploads"))
-          to_remove = [f for i, f in enumerate(files) if i % 2 == 1]
-          for fname in to_remove:
-            os.remove(f"uploads/{fname}")
-          logging.info(f"> thinned {len(to_remove)} of {len(files)} cached upload(s)")
+          before, after, level = upload_queue.compact()
+          logging.info(f"> compacted {before} cached record(s) into {after} (up to {level} readings each)")
         except OSError as e:
-          logging.error(f"> cache thinning failed: {e}")
+          logging.error(f"> cache compaction failed: {e}")
 
     # ---- board-specific pre-read (e.g. rain trigger check for weather) ----
     if hasattr(board, 'pre_read'):
       board.pre_read()
 
     # ---- read sensors ----
+    read_start = profiler.start()
     reading = board.read_sensors(vbus_present)
+    profiler.record("read", read_start)
     logging.info("> reading taken")
 
     # ---- storage info ----
@@ -456,32 +1100,55 @@ while True:
     logging.info(f"> storage: {free_kb}KB free / {total_kb}KB total")
 
     # ---- save locally ----
+    save_start = profiler.start()
     try:
       save_reading_locally(reading)
-      logging.debug("> saved reading to CSV")
+      logging.debug(f"> saved reading locally ({config.archive_format})")
     except Exception as e:
-      logging.error(f"> CSV save failed: {e}")
+      logging.error(f"> local save failed: {e}")
+
+    # ---- event triggers ----
+    triggered = check_triggers(reading)
+    if triggered:
+      logging.info(f"> triggered: {', '.join(triggered)}")
+
+    # ---- adaptive interval ----
+    interval = None
+    if config.adaptive_interval:
+      reading_frequency *= adapt_interval(reading, reset=bool(triggered))
+      interval = reading_frequency
+      logging.info(f"> adaptive interval: {interval} min")
 
     # ---- cache for upload ----
-    cache_reading(reading)
-    count = cached_upload_count()
+    if config.upload_mode == "summary":
+      upload_due = summarise_reading(reading, bool(triggered), interval,
+                                     upload_frequency or config.upload_frequency)
+      count = upload_queue.count()
+    else:
+      cache_reading(reading, bool(triggered), interval)
+      count = upload_queue.count()
+      upload_due = upload_frequency is not None and count >= upload_frequency
+    profiler.record("save", save_start)
+
+    # ---- housekeeping ----
+    compress_old_readings()
 
     # ---- upload if threshold reached ----
-    if count >= config.upload_frequency:
-      logging.info(f"> {count} cached, uploading")
-      if not upload_cached_readings():
-        # mark for retry next cycle
-        with open("reattempt_upload.txt", "w") as f:
-          f.write("")
-        logging.error("> upload failed, marked for retry")
-    else:
-      logging.info(f"> {count} cached, waiting for {config.upload_frequency}")
+    if upload_frequency is None:
+      logging.info(f"> {count} cached, uploads paused by power policy")
+    elif upload_due or triggered:
+      if not helpers.file_exists(RETRY_FILE):
+        logging.info(f"> {count} cached, uploading" + (" (triggered)" if triggered else ""))
+        upload_cached_readings()
+    elif config.upload_mode != "summary":
+      logging.info(f"> {count} cached, waiting for {upload_frequency}")
 
     # ---- success: reset error counter and clear warning LED ----
     consecutive_errors = 0
     warn_led_off()
 
     # ---- sleep ----
+    profiler.record("cycle", cycle_start)
     do_sleep()
 
   except Exception as exc:
@@ -489,6 +1156,7 @@ while True:
     buf = io.StringIO()
     sys.print_exception(exc, buf)
     logging.error(f"> exception: {buf.getvalue()}")
+    profiler.save()
     led_off()
     consecutive_errors += 1
 
@@ -506,4 +1174,5 @@ while True:
     else:
       logging.info(f"> transient error ({consecutive_errors}/{MAX_CONSECUTIVE_ERRORS}), retrying in 60s")
 
+    logging.flush()
     sleep(60)
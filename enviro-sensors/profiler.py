@@ -0,0 +1,77 @@
+# Enviro — Awake-time profiler
+# ticks_us timing of each phase of the main loop, with rolling stats on flash.
+# ============================================================
+#
+# Phases are timed with start()/record() during a cycle and folded into
+# timings.bin by save() once per cycle (just before sleep). The file is a
+# packed record per phase: sample count, rolling mean and last duration (µs).
+# Phases can nest (e.g. "upload" includes its "wifi" connect).
+
+import struct
+import time
+
+STATS_FILE = "timings.bin"
+PHASES = ("boot", "i2c_reset", "wifi", "ntp", "read", "save", "upload", "cycle", "housekeeping")
+_RECORD = "<HII"     # count, rolling mean (µs), last (µs)
+_MEAN_WINDOW = 8     # mean becomes an exponential average after this many samples
+
+_current = {}
+
+def start():
+  return time.ticks_us()
+
+def record(phase, start):
+  """Add the time since start to phase for this cycle. Returns elapsed µs."""
+  elapsed = time.ticks_diff(time.ticks_us(), start)
+  _current[phase] = _current.get(phase, 0) + elapsed
+  return elapsed
+
+def load():
+  """Returns {phase: [count, mean_us, last_us]} from flash."""
+  stats = {}
+  size = struct.calcsize(_RECORD)
+  try:
+    with open(STATS_FILE, "rb") as f:
+      data = f.read()
+  except OSError:
+    data = b""
+  for i, phase in enumerate(PHASES):
+    if len(data) >= (i + 1) * size:
+      stats[phase] = list(struct.unpack_from(_RECORD, data, i * size))
+    else:
+      stats[phase] = [0, 0, 0]
+  return stats
+
+def save():
+  """Fold this cycle's timings into the rolling stats and start a new cycle.
+  Flash errors are ignored: this also runs from the main loop's error
+  handler, possibly after a full or failing disk."""
+  if not _current:
+    return
+  stats = load()
+  for phase, elapsed in _current.items():
+    if phase not in stats:
+      continue
+    count, mean, _ = stats[phase]
+    n = min(count + 1, _MEAN_WINDOW)
+    mean = mean + (elapsed - mean) // n
+    stats[phase] = [min(count + 1, 0xffff), mean, elapsed]
+  _current.clear()
+  try:
+    with open(STATS_FILE, "wb") as f:
+      for phase in PHASES:
+        f.write(struct.pack(_RECORD, *stats[phase]))
+  except Exception:
+    pass
+
+def summary():
+  """Rolling stats as {phase: {"n", "mean_ms", "last_ms"}}, for the upload payload."""
+  result = {}
+  for phase, (count, mean, last) in load().items():
+    if count:
+      result[phase] = {"n": count, "mean_ms": mean // 1000, "last_ms": last // 1000}
+  return result
+
+def current_ms():
+  """This cycle's timings so far, in ms (for the log)."""
+  return " ".join(f"{p}={us // 1000}" for p, us in _current.items())
@@ -0,0 +1,69 @@
+# Enviro — Packed record helpers
+# Column typing and value packing shared by the upload queue and the
+# binary reading archive.
+# ============================================================
+#
+# Both files start with a one-line JSON header listing [name, typecode]
+# columns ("i" int32, "f" float32), followed by fixed-width little-endian
+# records. Missing values are stored as INT_NONE or NaN.
+
+import ujson
+
+try:
+  from binascii import crc32
+except ImportError:
+  # firmware built without CRC32 support — same polynomial, bit by bit
+  def crc32(data, crc=0):
+    crc ^= 0xffffffff
+    for byte in data:
+      crc ^= byte
+      for _ in range(8):
+        crc = (crc >> 1) ^ (0xedb88320 & -(crc & 1))
+    return crc ^ 0xffffffff
+
+INT_NONE = -2147483648  # stored in integer columns for missing values
+
+def typecode(value):
+  if value is None:
+    return None
+  return "i" if isinstance(value, int) else "f"
+
+def merge_columns(columns, values):
+  """Returns (columns, changed) — columns widened to hold every key in values.
+
+  New keys are appended and integer columns are widened to float when a
+  float value arrives. Existing order is kept so key order never matters."""
+  merged = [list(c) for c in columns]
+  names = [c[0] for c in merged]
+  changed = False
+  for key, value in values.items():
+    code = typecode(value)
+    if key in names:
+      column = merged[names.index(key)]
+      if code == "f" and column[1] == "i":
+        column[1] = "f"
+        changed = True
+    else:
+      merged.append([key, code or "f"])
+      names.append(key)
+      changed = True
+  return merged, changed
+
+def pack_value(code, value):
+  if value is None:
+    return INT_NONE if code == "i" else float("nan")
+  return int(value) if code == "i" else float(value)
+
+def unpack_value(code, value):
+  if code == "i":
+    return None if value == INT_NONE else value
+  return None if value != value else value  # NaN marks a missing value
+
+def header_bytes(header):
+  return (ujson.dumps(header) + "\n").encode()
+
+def read_header(path):
+  """Returns (header, header length in bytes). Raises OSError if path is missing."""
+  with open(path, "rb") as f:
+    line = f.readline()
+  return ujson.loads(line), len(line)
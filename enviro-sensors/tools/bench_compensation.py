@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Check compensation.py's saturation vapour pressure table against the formula.
+
+Loads ../compensation.py (with a stand-in config module) and sweeps the
+sensors' -40..85 °C range, reporting the worst error of the interpolated
+table, both in SVP and in the relative humidity a USB offset correction
+produces.
+
+Usage:
+    python3 bench_compensation.py [--step 0.01] [--offset 2.1]
+    python3 bench_compensation.py --emit-table   # regenerate SVP_TABLE
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import types
+
+
+def load_compensation():
+    sys.modules.setdefault("config", types.ModuleType("config"))
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "compensation.py")
+    spec = importlib.util.spec_from_file_location("compensation", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def emit_table(comp):
+    """Print SVP_TABLE in the layout used in compensation.py."""
+    values = [
+        comp.saturation_vapor_pressure_exact(t)
+        for t in range(comp.SVP_MIN_C, comp.SVP_MAX_C + 1, comp.SVP_STEP_C)
+    ]
+    print('SVP_TABLE = array("f", (  # Pa at SVP_MIN_C + i * SVP_STEP_C')
+    for i in range(0, len(values), 8):
+        row = " ".join(f"{v:.6g}," for v in values[i:i + 8])
+        print(f"  {row}  # {comp.SVP_MIN_C + i * comp.SVP_STEP_C} °C")
+    print("))")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy of the SVP table.")
+    parser.add_argument("--step", type=float, default=0.01, help="°C between test points")
+    parser.add_argument("--offset", type=float, default=2.1, help="°C temperature offset to correct")
+    parser.add_argument("--emit-table", action="store_true", help="print SVP_TABLE and exit")
+    args = parser.parse_args()
+
+    comp = load_compensation()
+    if args.emit_table:
+        emit_table(comp)
+        return
+
+    count = int((comp.SVP_MAX_C - comp.SVP_MIN_C) / args.step) + 1
+    temps = [comp.SVP_MIN_C + i * args.step for i in range(count)]
+
+    worst_rel, worst_rel_t = 0.0, None
+    for t in temps:
+        exact = comp.saturation_vapor_pressure_exact(t)
+        rel = abs(comp.saturation_vapor_pressure(t) - exact) / exact
+        if rel > worst_rel:
+            worst_rel, worst_rel_t = rel, t
+
+    # humidity after an offset correction, table vs formula
+    def adjust_exact(rh, t, new_t):
+        ah = rh / 100 * comp.saturation_vapor_pressure_exact(t) / (t + 273.15)
+        return ah * (new_t + 273.15) / comp.saturation_vapor_pressure_exact(new_t) * 100
+
+    worst_rh, worst_rh_t = 0.0, None
+    for t in temps:
+        if t - args.offset < comp.SVP_MIN_C:
+            continue
+        for rh in (20, 50, 80):
+            exact = adjust_exact(rh, t, t - args.offset)
+            error = abs(comp.adjust_humidity(rh, t, t - args.offset) - exact)
+            if error > worst_rh:
+                worst_rh, worst_rh_t = error, t
+
+    print(f"range            {comp.SVP_MIN_C}..{comp.SVP_MAX_C} °C, {len(comp.SVP_TABLE)} entries, {count} test points")
+    print(f"max SVP error    {worst_rel * 100:.3f}% (at {worst_rel_t:.2f} °C)")
+    print(f"max RH error     {worst_rh:.4f} %RH after a {args.offset} °C correction (at {worst_rh_t:.2f} °C)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Compare flash writes per rain tip: old rain.txt log vs the rain.bin log.
+
+Replays a storm of rain tips through both strategies against a scratch
+directory, counting file opens, bytes read and bytes written, and estimating
+the 4 KB littlefs blocks programmed (a rewritten file is copied to fresh
+blocks; an append only programs the bytes added).
+
+Usage:
+    python3 bench_rain.py [--tips N] [--readings-every N]
+"""
+
+import argparse
+import os
+import struct
+import tempfile
+import time
+
+BLOCK_SIZE = 4096
+
+
+class Counter:
+    def __init__(self):
+        self.opens = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.blocks = 0
+
+    def read(self, path):
+        self.opens += 1
+        with open(path, "rb") as fh:
+            data = fh.read()
+        self.bytes_read += len(data)
+        return data
+
+    def write(self, path, data, append=False):
+        self.opens += 1
+        with open(path, "ab" if append else "wb") as fh:
+            fh.write(data)
+        self.bytes_written += len(data)
+        if append:
+            self.blocks += len(data) / BLOCK_SIZE
+        else:
+            self.blocks += max(1, -(-len(data) // BLOCK_SIZE))
+
+
+def timestamp(epoch):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+
+def old_record_tip(counter, path, now):
+    """The previous _record_rain_tip(): read, append, slice to 190, rewrite."""
+    entries = []
+    if os.path.exists(path):
+        entries = counter.read(path).decode().split("\n")
+    entries.append(timestamp(now))
+    entries = entries[-190:]
+    counter.write(path, "\n".join(entries).encode())
+
+
+def old_read(counter, path):
+    if os.path.exists(path):
+        counter.read(path)
+        os.remove(path)
+
+
+def new_record_tip(counter, path, now):
+    """The rain.bin _record_rain_tip(): a single 4-byte append."""
+    if not os.path.exists(path):
+        counter.write(path, struct.pack("<I", now - 300))
+    counter.write(path, struct.pack("<I", now), append=True)
+
+
+def new_read(counter, path, now):
+    counter.opens += 1  # stat + 4-byte header read
+    counter.bytes_read += 4
+    counter.write(path, struct.pack("<I", now))
+
+
+def run(tips, readings_every):
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in ("rain.txt", "rain.bin"):
+            path = os.path.join(scratch, name)
+            counter = Counter()
+            now = 1_700_000_000
+            for tip in range(1, tips + 1):
+                now += 3
+                if name == "rain.txt":
+                    old_record_tip(counter, path, now)
+                else:
+                    new_record_tip(counter, path, now)
+                if tip % readings_every == 0:
+                    if name == "rain.txt":
+                        old_read(counter, path)
+                    else:
+                        new_read(counter, path, now)
+            results[name] = counter
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rain tip logging flash writes.")
+    parser.add_argument("--tips", type=int, default=2000, help="Tips to simulate (default: 2000)")
+    parser.add_argument(
+        "--readings-every",
+        type=int,
+        default=100,
+        help="Tips between readings that reset the log (default: 100)",
+    )
+    args = parser.parse_args()
+
+    results = run(args.tips, args.readings_every)
+    print(f"{args.tips} tips, a reading every {args.readings_every} tips\n")
+    print(f"{'log':<10}{'opens/tip':>12}{'read B/tip':>12}{'written B/tip':>15}{'blocks/tip':>12}")
+    for name, c in results.items():
+        print(
+            f"{name:<10}{c.opens / args.tips:>12.2f}{c.bytes_read / args.tips:>12.1f}"
+            f"{c.bytes_written / args.tips:>15.1f}{c.blocks / args.tips:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Decode Enviro reading archives (readings/YYYY-MM-DD.bin and .csv.gz).
+
+Each file starts with a one-line JSON header listing ``[name, typecode]``
+columns ("i" int32, "f" float32), followed by fixed-width little-endian rows:
+an int32 epoch timestamp, then one value per column.  Missing values are
+stored as NaN (floats) or -2147483648 (ints).
+
+Compressed CSV files (readings/YYYY-MM-DD.csv.gz) are gzipped on the device
+a chunk of whole rows at a time, one gzip member per chunk.  A chunk can be
+repeated if the device lost power mid-way, so rows that don't move time
+forward are dropped.
+CSV rows carry no headings; pass --columns readings/columns.txt to add them.
+
+Usage:
+    python3 read_archive.py FILE [FILE ...] > readings.csv
+    python3 read_archive.py --columns readings/columns.txt readings/*.csv.gz > readings.csv
+    python3 read_archive.py --stats readings/*.csv.gz readings/*.bin
+
+--stats prints how much flash each file saves over plain CSV rows instead
+of decoding it.
+
+From Python, ``load_numpy(path)`` returns a NumPy structured array (NumPy is
+only needed for that function).
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import math
+import os
+import struct
+import sys
+from datetime import datetime, timezone
+
+INT_NONE = -2147483648
+
+
+def read_header(path: str) -> tuple[dict, int]:
+    """Return the archive header and its length in bytes."""
+    with open(path, "rb") as fh:
+        line = fh.readline()
+    return json.loads(line), len(line)
+
+
+def row_format(header: dict) -> str:
+    return "<i" + "".join(code for _, code in header["columns"])
+
+
+def load(path: str) -> tuple[list[str], list[tuple]]:
+    """Return (column names, rows) with missing values as None."""
+    header, header_len = read_header(path)
+    fmt = row_format(header)
+    size = struct.calcsize(fmt)
+    with open(path, "rb") as fh:
+        fh.seek(header_len)
+        data = fh.read()
+    rows = []
+    for offset in range(0, len(data) - size + 1, size):
+        values = struct.unpack_from(fmt, data, offset)
+        rows.append(tuple(
+            None if v == INT_NONE or (isinstance(v, float) and math.isnan(v)) else v
+            for v in values
+        ))
+    names = ["timestamp"] + [name for name, _ in header["columns"]]
+    return names, rows
+
+
+def load_numpy(path: str):
+    """Return the archive as a NumPy structured array (one field per column)."""
+    import numpy as np
+
+    header, header_len = read_header(path)
+    dtype = np.dtype(
+        [("timestamp", "<i4")]
+        + [(name, "<i4" if code == "i" else "<f4") for name, code in header["columns"]]
+    )
+    return np.fromfile(path, dtype=dtype, offset=header_len)
+
+
+def load_csv(path: str) -> list[str]:
+    """Return the rows of a .csv or .csv.gz file, without repeated chunks."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="") as fh:
+        lines = fh.read().splitlines()
+    rows = []
+    last = ""
+    for line in lines:
+        # ISO timestamps sort as text; a re-compressed chunk goes back in time
+        timestamp = line.split(",", 1)[0]
+        if line and timestamp > last:
+            rows.append(line)
+            last = timestamp
+    return rows
+
+
+def format_value(value) -> str:
+    if value is None:
+        return ""
+    # float32 values print with 6 significant digits (e.g. 21.37, not 21.3700008)
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+def iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def csv_size(path: str) -> int:
+    """Bytes the file's rows take as the device's CSV text."""
+    if not path.endswith(".bin"):
+        return sum(len(line) + 1 for line in load_csv(path))
+    _, rows = load(path)
+    return sum(
+        len(",".join([iso(row[0])] + [format_value(v) for v in row[1:]])) + 1
+        for row in rows
+    )
+
+
+def print_stats(paths: list[str]):
+    total_csv = total_stored = 0
+    for path in paths:
+        stored = os.path.getsize(path)
+        size = csv_size(path)
+        total_csv += size
+        total_stored += stored
+        print(f"{path}: {size} bytes as CSV, {stored} stored ({size / stored:.2f}x)")
+    if len(paths) > 1 and total_stored:
+        print(f"total: {total_csv} bytes as CSV, {total_stored} stored ({total_csv / total_stored:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode Enviro reading archives to CSV.")
+    parser.add_argument("files", nargs="+", help="readings/YYYY-MM-DD.bin, .csv or .csv.gz files")
+    parser.add_argument("--columns", help="readings/columns.txt, for headings on CSV files")
+    parser.add_argument("--stats", action="store_true", help="print size vs plain CSV instead of decoding")
+    args = parser.parse_args()
+
+    if args.stats:
+        print_stats(args.files)
+        return
+
+    writer = csv.writer(sys.stdout)
+    last_names = None
+    for path in args.files:
+        if not path.endswith(".bin"):
+            if args.columns and last_names != args.columns:
+                with open(args.columns) as fh:
+                    sys.stdout.write(fh.readline())
+                last_names = args.columns
+            for line in load_csv(path):
+                sys.stdout.write(line + "\n")
+            continue
+        names, rows = load(path)
+        if names != last_names:
+            writer.writerow(names)
+            last_names = names
+        for row in rows:
+            writer.writerow([iso(row[0])] + [format_value(v) for v in row[1:]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Local test receiver for Enviro uploads — a stand-in for worker.js.
+
+Accepts the same POST bodies as the Cloudflare Worker (a single reading, or a
+JSON array of readings, optionally ``Content-Encoding: gzip``) and stores one
+JSON file per reading in ``{nickname}-{uid}/{timestamp}.json``, the layout
+``data-vis/build_data.py`` reads.
+
+Usage:
+    python3 receiver.py [--port PORT] [--dir DATA_DIR]
+
+Point ``upload_url`` in config.py at ``http://<host-ip>:<port>/``.  If --dir is
+omitted readings are written into ``../data-vis``.
+"""
+
+import argparse
+import gzip
+import json
+import os
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+REQUIRED_FIELDS = ("nickname", "model", "uid", "timestamp", "readings")
+
+
+def is_valid_payload(payload) -> bool:
+    return isinstance(payload, dict) and all(payload.get(k) for k in REQUIRED_FIELDS)
+
+
+def store_payload(base: str, payload: dict) -> str:
+    """Write *payload* under *base* using the Worker's object naming."""
+    device_dir = os.path.join(base, f"{payload['nickname']}-{payload['uid']}")
+    os.makedirs(device_dir, exist_ok=True)
+    path = os.path.join(device_dir, f"{payload['timestamp']}.json")
+    with open(path, "w") as fh:
+        json.dump(payload, fh)
+    return path
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    data_dir = "."
+
+    def respond(self, status: int, message: str):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.end_headers()
+        self.wfile.write(message.encode())
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = raw
+        try:
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(raw)
+            content = json.loads(body)
+        except (OSError, ValueError):
+            self.respond(400, "Invalid JSON payload")
+            return
+
+        payloads = content if isinstance(content, list) else [content]
+        if not payloads or not all(is_valid_payload(p) for p in payloads):
+            self.respond(400, "Invalid payload structure")
+            return
+
+        for payload in payloads:
+            store_payload(self.data_dir, payload)
+
+        print(
+            f"stored {len(payloads)} reading(s) from {payloads[0]['nickname']}: "
+            f"{len(raw)} bytes on the wire, {len(body)} bytes of JSON"
+        )
+        self.respond(200, "Data stored successfully")
+
+    def do_GET(self):
+        self.respond(405, "Method not allowed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local test receiver for Enviro uploads.")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument(
+        "--dir",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data-vis"),
+        help="Directory to store device reading folders in (default: ../data-vis)",
+    )
+    args = parser.parse_args()
+
+    ReceiverHandler.data_dir = args.dir
+    server = HTTPServer(("", args.port), ReceiverHandler)
+    print(f"Listening on port {args.port}, storing readings in {os.path.abspath(args.dir)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+# Enviro — Upload queue
+# Append-only binary queue of readings waiting to be uploaded.
+# ============================================================
+#
+# queue.bin starts with a one-line JSON header describing the record layout
+# (meta columns such as timestamp/power mode, then the board's reading keys),
+# followed by fixed-width packed records — one per reading (see records.py).
+# queue.idx holds the drain cursor (head). Enqueue is a single append, the
+# pending count is a stat() plus two tiny reads, and draining reads records
+# sequentially.
+#
+# For newest-first uploads, queue.idx also holds one "gap": a run of records
+# [gap_start, gap_end) that was sent ahead of the backlog. Pending records
+# are [head, gap_start) and [gap_end, tail); when the head reaches the gap it
+# jumps over it. The last field counts failed attempts to upload the head
+# record, so one the server keeps rejecting can be set aside.
+#
+# Each record ends with a CRC32 of its packed values. A record that fails the
+# check (a brownout mid-append) decodes as None and is skipped by the
+# uploader; enqueue() pads a partial record at the tail to a whole one so
+# later records stay aligned. queue.idx is replaced by rename, and queue.bin
+# is only ever rewritten into queue.tmp and renamed.
+#
+# Both files are removed once the queue has been fully drained, so a queue
+# that keeps up with uploads costs no flash at all between readings.
+#
+# Under disk pressure compact() merges adjacent records into aggregates
+# (sample count plus min/mean/max per reading). An aggregated queue stores
+# three floats per reading key, and new readings appended to it are stored
+# as aggregates of one sample. Summaries queued by the summary upload mode
+# are aggregates too, with a fourth float per key for the last value.
+
+import os
+import struct
+from ucollections import OrderedDict
+import records
+
+QUEUE_FILE = "queue.bin"
+INDEX_FILE = "queue.idx"
+TMP_FILE = "queue.tmp"
+INDEX_TMP_FILE = "queue.idx.tmp"
+VERSION = 1
+
+AGGREGATE_META = [["samples", "i"], ["end", "i"]]
+AGGREGATE_KEYS = ("samples", "end", "min", "max", "last")  # meta not stored as plain columns
+FIRST_COMPACTION = 4    # raw records merged per aggregate on the first pass —
+                        # an aggregate is ~3x wider, so merging pairs wouldn't free space
+
+def _record_format(header):
+  codes = [c[1] for c in header["meta"]]
+  if header.get("aggregate"):
+    # min, mean, max (and last)
+    codes += ["ffff" if header.get("last") else "fff"] * len(header["readings"])
+  else:
+    codes += [c[1] for c in header["readings"]]
+  return "<" + "".join(codes)
+
+def _record_size(header, fmt):
+  return struct.calcsize(fmt) + (4 if header.get("crc") else 0)
+
+def _encode(header, fmt, meta, readings):
+  aggregate = header.get("aggregate")
+  if aggregate and "samples" not in meta:
+    # a single reading stored as an aggregate of one
+    meta = dict(meta)
+    meta["samples"] = 1
+    meta["end"] = meta["timestamp"]
+  values = []
+  for name, code in header["meta"]:
+    values.append(records.pack_value(code, meta.get(name)))
+  mins = meta.get("min", {})
+  maxs = meta.get("max", {})
+  lasts = meta.get("last", {})
+  for name, code in header["readings"]:
+    value = readings.get(name)
+    if aggregate:
+      values.append(records.pack_value("f", mins.get(name, value)))
+      values.append(records.pack_value("f", value))
+      values.append(records.pack_value("f", maxs.get(name, value)))
+      if header.get("last"):
+        values.append(records.pack_value("f", lasts.get(name, value)))
+    else:
+      values.append(records.pack_value(code, value))
+  data = struct.pack(fmt, *values)
+  if header.get("crc"):
+    data += struct.pack("<I", records.crc32(data))
+  return data
+
+def _decode(header, fmt, data):
+  """Returns (meta, readings), or None if the record fails its CRC.
+  Aggregated records are (meta, mean readings), with "samples", "end" and
+  per-key "min"/"max" (and "last") dicts in meta."""
+  if header.get("crc"):
+    if struct.unpack_from("<I", data, len(data) - 4)[0] != records.crc32(data[:-4]):
+      return None
+    data = data[:-4]
+  values = struct.unpack(fmt, data)
+  meta = {}
+  readings = OrderedDict()
+  i = 0
+  for name, code in header["meta"]:
+    meta[name] = records.unpack_value(code, values[i])
+    i += 1
+  if header.get("aggregate"):
+    meta["min"] = {}
+    meta["max"] = {}
+    if header.get("last"):
+      meta["last"] = {}
+    for name, _ in header["readings"]:
+      meta["min"][name] = records.unpack_value("f", values[i])
+      readings[name] = records.unpack_value("f", values[i + 1])
+      meta["max"][name] = records.unpack_value("f", values[i + 2])
+      i += 3
+      if header.get("last"):
+        meta["last"][name] = records.unpack_value("f", values[i])
+        i += 1
+  else:
+    for name, code in header["readings"]:
+      readings[name] = records.unpack_value(code, values[i])
+      i += 1
+  return meta, readings
+
+def _merge(batch):
+  """Merge consecutive (meta, readings) records into one aggregate."""
+  first_meta = batch[0][0]
+  last_meta = batch[-1][0]
+  meta = dict(last_meta)
+  meta["timestamp"] = first_meta["timestamp"]
+  meta["end"] = last_meta.get("end") or last_meta["timestamp"]
+  meta["samples"] = 0
+  meta["min"] = {}
+  meta["max"] = {}
+  meta["last"] = {}
+  readings = OrderedDict()
+  for m, _ in batch:
+    meta["samples"] += m.get("samples") or 1
+
+  for key in batch[0][1]:
+    total = 0
+    weight = 0
+    lo = None
+    hi = None
+    last = None
+    for m, r in batch:
+      value = r[key]
+      if value is None:
+        continue
+      last = m.get("last", {}).get(key, value)
+      w = m.get("samples") or 1
+      total += value * w
+      weight += w
+      vlo = m.get("min", {}).get(key, value)
+      vhi = m.get("max", {}).get(key, value)
+      lo = vlo if lo is None else min(lo, vlo)
+      hi = vhi if hi is None else max(hi, vhi)
+    readings[key] = total / weight if weight else None
+    meta["min"][key] = lo
+    meta["max"][key] = hi
+    meta["last"][key] = last
+  return meta, readings
+
+def _layout():
+  """Returns (header, fmt, header_len, record_size) or None if there is no queue."""
+  _remove(TMP_FILE)  # left by a rewrite interrupted before its rename
+  try:
+    header, header_len = records.read_header(QUEUE_FILE)
+  except OSError:
+    return None
+  except ValueError:
+    # the header is only written when a queue is created, so a torn one
+    # means the brownout came before any record was stored
+    clear()
+    return None
+  fmt = _record_format(header)
+  return header, fmt, header_len, _record_size(header, fmt)
+
+def _read_index_data():
+  try:
+    with open(INDEX_FILE, "rb") as f:
+      return f.read(16)
+  except OSError:
+    return b""
+
+def _read_index():
+  """Returns (head, gap_start, gap_end)."""
+  data = _read_index_data()
+  if len(data) >= 12:
+    return struct.unpack_from("<III", data)
+  if len(data) == 4:
+    return struct.unpack("<I", data)[0], 0, 0  # head only, from earlier firmware
+  return 0, 0, 0
+
+def _read_attempts():
+  data = _read_index_data()
+  return struct.unpack_from("<I", data, 12)[0] if len(data) == 16 else 0
+
+def _write_index(head, gap_start=0, gap_end=0, attempts=0):
+  with open(INDEX_TMP_FILE, "wb") as f:
+    f.write(struct.pack("<IIII", head, gap_start, gap_end, attempts))
+  os.rename(INDEX_TMP_FILE, INDEX_FILE)
+
+def _tail(header_len, record_size):
+  return (os.stat(QUEUE_FILE)[6] - header_len) // record_size
+
+def count():
+  """Number of readings waiting to be uploaded."""
+  layout = _layout()
+  if layout is None:
+    return 0
+  _, _, header_len, record_size = layout
+  head, gap_start, gap_end = _read_index()
+  return max(0, _tail(header_len, record_size) - head - (gap_end - gap_start))
+
+def _rewrite(header, layout, group=1):
+  """Stream pending records into a fresh queue file using header's layout,
+  merging each run of group records into one aggregate. Returns the new
+  record count.
+
+  Only group records are held in RAM at a time. The cursor is reset before
+  the rename so an interrupted rewrite can only re-send readings, never
+  lose them."""
+  old_header, old_fmt, header_len, record_size = layout
+  fmt = _record_format(header)
+  head, gap_start, gap_end = _read_index()
+  index = head
+  written = 0
+  try:
+    with open(QUEUE_FILE, "rb") as src:
+      with open(TMP_FILE, "wb") as dst:
+        dst.write(records.header_bytes(header))
+        src.seek(header_len + head * record_size)
+        batch = []
+        while True:
+          if index == gap_start and gap_start < gap_end:
+            src.seek(header_len + gap_end * record_size)  # already sent
+            index = gap_end
+          data = src.read(record_size)
+          index += 1
+          if len(data) == record_size:
+            record = _decode(old_header, old_fmt, data)
+            if record is not None:  # corrupt records are dropped
+              batch.append(record)
+            if len(batch) < group:
+              continue
+          if not batch:
+            break
+          meta, readings = batch[0] if group == 1 else _merge(batch)
+          dst.write(_encode(header, fmt, meta, readings))
+          written += 1
+          batch = []
+          if len(data) < record_size:
+            break
+  except Exception:
+    # compaction runs with the disk nearly full: don't leave a partial copy
+    # holding the last free blocks
+    _remove(TMP_FILE)
+    raise
+  _write_index(0)
+  os.rename(TMP_FILE, QUEUE_FILE)
+  return written
+
+def _plain_meta(meta):
+  return OrderedDict((k, v) for k, v in meta.items() if k not in AGGREGATE_KEYS)
+
+def enqueue(meta, readings):
+  """Append one reading. meta and readings map column names to numbers.
+
+  An aggregate (meta with "samples", "end", "min", "max" and optionally
+  "last", readings holding the means) switches the queue to the aggregate
+  layout; plain readings queued after that are aggregates of one."""
+  aggregate = "samples" in meta
+  last = "last" in meta
+  layout = _layout()
+  if layout is None:
+    header = {
+      "version": VERSION,
+      "meta": records.merge_columns([], _plain_meta(meta))[0],
+      "readings": records.merge_columns([], readings)[0],
+      "crc": True,
+    }
+    if aggregate:
+      header["meta"] += AGGREGATE_META
+      header["aggregate"] = True
+      header["level"] = 1
+    if last:
+      header["last"] = True
+    with open(QUEUE_FILE, "wb") as f:
+      f.write(records.header_bytes(header))
+    _write_index(0)
+  else:
+    header, _, header_len, record_size = layout
+    meta_columns, meta_changed = records.merge_columns(header["meta"], _plain_meta(meta))
+    reading_columns, readings_changed = records.merge_columns(header["readings"], readings)
+    to_aggregate = aggregate and not header.get("aggregate")
+    to_last = last and not header.get("last")
+    if meta_changed or readings_changed or to_aggregate or to_last or not header.get("crc"):
+      # new keys (e.g. after a firmware update), a new layout, or a queue
+      # from firmware without record CRCs — migrate pending records
+      header = dict(header)
+      header["meta"] = meta_columns
+      header["readings"] = reading_columns
+      header["crc"] = True
+      if to_aggregate:
+        header["meta"] = header["meta"] + AGGREGATE_META
+        header["aggregate"] = True
+        header["level"] = 1
+      if to_last:
+        header["last"] = True
+      _rewrite(header, layout)
+    else:
+      partial = (os.stat(QUEUE_FILE)[6] - header_len) % record_size
+      if partial:
+        # a torn append — pad it out to a whole (corrupt) record
+        with open(QUEUE_FILE, "ab") as f:
+          f.write(b"\xff" * (record_size - partial))
+
+  with open(QUEUE_FILE, "ab") as f:
+    f.write(_encode(header, _record_format(header), meta, readings))
+
+def peek(limit):
+  """Return up to limit pending (meta, readings) tuples, oldest first.
+  Records that fail their CRC are returned as None, so callers still count
+  them when advancing."""
+  layout = _layout()
+  if layout is None:
+    return []
+  header, fmt, header_len, record_size = layout
+  head, gap_start, gap_end = _read_index()
+  end = gap_start if gap_start < gap_end else _tail(header_len, record_size)
+  return _read_range(layout, head, min(end, head + limit))
+
+def _read_range(layout, start, end):
+  header, fmt, header_len, record_size = layout
+  batch = []
+  with open(QUEUE_FILE, "rb") as f:
+    f.seek(header_len + start * record_size)
+    for _ in range(start, end):
+      data = f.read(record_size)
+      if len(data) < record_size:
+        break
+      batch.append(_decode(header, fmt, data))
+  return batch
+
+def advance(n):
+  """Mark the n oldest pending readings as uploaded."""
+  layout = _layout()
+  if layout is None:
+    return
+  _, _, header_len, record_size = layout
+  head, gap_start, gap_end = _read_index()
+  _set_index(head + n, gap_start, gap_end, _tail(header_len, record_size))
+
+def _set_index(head, gap_start, gap_end, tail, attempts=0):
+  if gap_start < gap_end and head >= gap_start:
+    head = max(head, gap_end)  # reached the gap — skip what was already sent
+    gap_start = gap_end = 0
+  if head >= tail:
+    clear()
+  else:
+    _write_index(head, gap_start, gap_end, attempts)
+
+def peek_recent(limit):
+  """Pending readings to send ahead of the backlog (newest-first uploads).
+
+  Without a gap, this is up to limit of the newest readings, newest first.
+  Once a gap exists it is the readings queued after it, oldest first, so
+  the gap can grow over them. Either way advance_recent(n) marks the first
+  n returned as uploaded."""
+  layout = _layout()
+  if layout is None:
+    return []
+  _, _, header_len, record_size = layout
+  head, gap_start, gap_end = _read_index()
+  tail = _tail(header_len, record_size)
+  if gap_start < gap_end:
+    return _read_range(layout, gap_end, min(tail, gap_end + limit))
+  batch = _read_range(layout, max(head, tail - limit), tail)
+  batch.reverse()
+  return batch
+
+def advance_recent(n):
+  """Mark the first n readings from peek_recent() as uploaded."""
+  layout = _layout()
+  if layout is None:
+    return
+  _, _, header_len, record_size = layout
+  head, gap_start, gap_end = _read_index()
+  tail = _tail(header_len, record_size)
+  if gap_start < gap_end:
+    gap_end += n
+  else:
+    gap_start = max(head, tail - n)
+    gap_end = tail
+  _set_index(head, gap_start, gap_end, tail, _read_attempts())
+
+def failed_attempt():
+  """Count a rejected upload of the oldest pending reading. Returns the
+  number of attempts so far (reset whenever the head moves)."""
+  attempts = _read_attempts() + 1
+  head, gap_start, gap_end = _read_index()
+  _write_index(head, gap_start, gap_end, attempts)
+  return attempts
+
+def compact():
+  """Merge adjacent pending records into min/mean/max aggregates.
+
+  The first pass merges FIRST_COMPACTION raw readings per record; every
+  later pass merges pairs, halving the queue again (4x, 8x, 16x ...).
+  Returns (records before, records after, readings per record — or queued
+  summaries per record for a summary queue)."""
+  layout = _layout()
+  if layout is None:
+    return 0, 0, 0
+  header = layout[0]
+  before = count()
+  if header.get("aggregate"):
+    group = 2
+    level = header["level"] * 2
+    new_header = header
+  else:
+    group = FIRST_COMPACTION
+    level = FIRST_COMPACTION
+    new_header = dict(header)
+    new_header["meta"] = header["meta"] + AGGREGATE_META
+    new_header["aggregate"] = True
+  new_header = dict(new_header)
+  new_header["level"] = level
+  new_header["crc"] = True
+  after = _rewrite(new_header, layout, group)
+  return before, after, level
+
+def _remove(path):
+  try:
+    os.remove(path)
+  except OSError:
+    pass
+
+def clear():
+  for path in (QUEUE_FILE, INDEX_FILE, INDEX_TMP_FILE):
+    _remove(path)
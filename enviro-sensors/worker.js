@@ -1,29 +1,43 @@
 // Cloudflare Worker script to handle JSON payloads and store them in R2
 // Requires an R2 bucket binding named `enviro_r2`
+// Accepts a single reading object, or a JSON array of readings (batched upload),
+// optionally gzip-compressed (`Content-Encoding: gzip`)
 addEventListener('fetch', event => {
   event.respondWith(handleRequest(event.request))
 })
 
+function isValidPayload(payload) {
+  return payload && payload.nickname && payload.model && payload.uid && payload.timestamp && payload.readings;
+}
+
 async function handleRequest(request) {
   if (request.method !== 'POST') {
     return new Response('Method not allowed', { status: 405 });
   }
 
-  let payload;
+  let body;
   try {
-    payload = await request.json();
+    if (request.headers.get('Content-Encoding') === 'gzip') {
+      const stream = request.body.pipeThrough(new DecompressionStream('gzip'));
+      body = await new Response(stream).json();
+    } else {
+      body = await request.json();
+    }
   } catch (e) {
     return new Response('Invalid JSON payload', { status: 400 });
   }
 
-  if (!payload.nickname || !payload.model || !payload.uid || !payload.timestamp || !payload.readings) {
+  const payloads = Array.isArray(body) ? body : [body];
+  if (payloads.length === 0 || !payloads.every(isValidPayload)) {
     return new Response('Invalid payload structure', { status: 400 });
   }
 
   try {
-    const dir = payload.nickname ? `${payload.nickname}-${payload.uid}` : payload.uid;
-    const objectName = `${dir}/${payload.timestamp}.json`;
-    await enviro_r2.put(objectName, JSON.stringify(payload));
+    await Promise.all(payloads.map(payload => {
+      const dir = payload.nickname ? `${payload.nickname}-${payload.uid}` : payload.uid;
+      const objectName = `${dir}/${payload.timestamp}.json`;
+      return enviro_r2.put(objectName, JSON.stringify(payload));
+    }));
     return new Response('Data stored successfully', { status: 200 });
   } catch (e) {
     return new Response('Failed to store data', { status: 500 });